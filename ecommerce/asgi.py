@@ -14,3 +14,24 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 
 application = get_asgi_application()
+
+# Build the in-process autocomplete index before the first request.
+# Servers such as uvicorn import this module inside their event loop,
+# where Django refuses synchronous queries, so build it from a thread.
+from threading import Thread  # noqa: E402
+
+from django.db import connection  # noqa: E402
+
+from store.autocomplete import warm  # noqa: E402
+
+
+def _warm():
+    try:
+        warm()
+    finally:
+        connection.close()
+
+
+warm_thread = Thread(target=_warm, name='autocomplete-warm')
+warm_thread.start()
+warm_thread.join()
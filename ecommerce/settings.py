@@ -1,5 +1,9 @@
 from pathlib import Path
 import os
+import tempfile
+import warnings
+
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -31,6 +35,8 @@ INSTALLED_APPS = [
 # ================= MIDDLEWARE =================
 
 MIDDLEWARE = [
+    'store.middleware.MetricsMiddleware',
+    'store.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -41,6 +47,32 @@ MIDDLEWARE = [
 ]
 
 
+# Fraction of requests timed by PerformanceMiddleware (0 disables it).
+# Samples are shown at /admin/performance/.
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', '0.05'))
+
+# Prometheus counters from every worker process are summed in this file and
+# exposed at /metrics. Only staff users can read it unless METRICS_TOKEN is
+# set, in which case scrapers send "Authorization: Bearer <token>".
+METRICS_DB_PATH = os.environ.get(
+    'METRICS_DB_PATH',
+    str(Path(tempfile.gettempdir()) / 'smart-shop-metrics.sqlite3')
+)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+# Route home, product detail, my orders and notifications to their async
+# versions (store/async_views.py). Only worth it under ASGI (SERVER_MODE=asgi
+# in the Procfile); under WSGI every async view costs an event loop per request.
+STORE_ASYNC_VIEWS = os.environ.get('STORE_ASYNC_VIEWS', 'False') == 'True'
+
+# Push new notifications to open pages over server-sent events
+# (store/live.py). Each open tab holds a connection, so this needs ASGI too.
+STORE_LIVE_NOTIFICATIONS = os.environ.get(
+    'STORE_LIVE_NOTIFICATIONS', str(STORE_ASYNC_VIEWS)
+) == 'True'
+
+
 # ================= URL / TEMPLATE =================
 
 ROOT_URLCONF = 'ecommerce.urls'
@@ -71,9 +103,77 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock at BEGIN so concurrent checkouts wait on the
+        # busy timeout instead of failing when a read lock is upgraded.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+
+# ================= CACHE & SESSIONS =================
+
+# Neither mode needs an outside service:
+#   locmem  per process; only coherent with a single worker
+#   file    shared by every worker on the host through CACHE_LOCATION
+# Cached navbar counts, catalog versions and sessions must agree across
+# workers, so more than one worker (WEB_CONCURRENCY, which gunicorn and the
+# ASGI line of the Procfile both use) defaults to the file cache.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file' if WEB_CONCURRENCY > 1 else 'locmem')
+if CACHE_BACKEND == 'locmem' and WEB_CONCURRENCY > 1:
+    warnings.warn(
+        f"CACHE_BACKEND=locmem with {WEB_CONCURRENCY} workers: each worker keeps "
+        "its own notification counts and catalog version, and serves stale "
+        "ones after changes made on another worker."
+    )
+CACHE_LOCATION = os.environ.get(
+    'CACHE_LOCATION',
+    str(Path(tempfile.gettempdir()) / 'smart-shop-cache')
+)
+
+_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+
+def _cache(name, max_entries):
+    return {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': name if CACHE_BACKEND == 'locmem' else str(Path(CACHE_LOCATION) / name),
+        'OPTIONS': {'MAX_ENTRIES': max_entries},
     }
+
+
+# Sessions get their own cache so catalog pages can never evict them, and
+# per-product template fragments get one sized for a large catalog.
+CACHES = {
+    'default': _cache('default', 1000),
+    'sessions': _cache('sessions', 20000),
+    'fragments': _cache('fragments', 20000),
 }
 
+# Sessions live in the database by default, which every worker sees the
+# same way. SESSION_STORE=cached_db serves them from the cache instead
+# (store.sessions: Django's cached_db engine minus writes that would not
+# change anything) and SESSION_STORE=cache keeps them in the cache only.
+# Both need a cache every worker shares: with a per-process cache a logout
+# on one worker would leave the session alive on the others.
+SESSION_STORE = os.environ.get('SESSION_STORE', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'store.sessions',
+    'cache': 'django.contrib.sessions.backends.cache',
+}[SESSION_STORE]
+if SESSION_STORE != 'db' and CACHE_BACKEND == 'locmem':
+    raise ImproperlyConfigured(
+        f"SESSION_STORE={SESSION_STORE} needs a cache shared by every worker; "
+        "set CACHE_BACKEND=file or use SESSION_STORE=db."
+    )
+SESSION_CACHE_ALIAS = 'sessions'
+
 
 # ================= INTERNATIONALIZATION =================
 
@@ -92,6 +192,10 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered invoices of delivered/cancelled orders. Kept out of MEDIA_ROOT
+# because they must never be publicly served.
+INVOICE_SNAPSHOT_ROOT = BASE_DIR / 'invoice_snapshots'
+
 
 # ================= AUTH =================
 
@@ -127,6 +231,20 @@ SESSION_COOKIE_AGE = 60 * 60 * 24
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# ================= SALES ROLLUP =================
+
+# Keep DailySalesStats up to date as orders are placed and cancelled.
+# Rebuild it with `python manage.py rebuild_sales_stats`.
+SALES_ROLLUP_ENABLED = os.environ.get('SALES_ROLLUP_ENABLED', 'True') == 'True'
+
+
+# ================= NOTIFICATION RETENTION =================
+
+# Enforced by `python manage.py prune_notifications`; run it daily.
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', '90'))
+NOTIFICATION_MAX_PER_USER = int(os.environ.get('NOTIFICATION_MAX_PER_USER', '200'))
+
+
 # ================= PAYMENT =================
 
 RAZORPAY_KEY_ID = 'rzp_test_RwwR0BVpcuV8gA'
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 
 application = get_wsgi_application()
+
+# Build the in-process autocomplete index before the first request.
+from store.autocomplete import warm  # noqa: E402
+
+warm()
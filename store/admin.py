@@ -1,9 +1,13 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from django.urls import path
 from django.shortcuts import render
-from django.db.models import Sum
 
-from .models import Category, Product, Order, OrderItem, UserProfile, Notification
+from . import perf
+from .models import Category, Product, Order, OrderItem, UserProfile, OutgoingEmail
+from .orders import transition_orders
+from .search import search_products
+from .stats import order_overview, rollup_enabled, sales_breakdown
 
 
 # ---------------- CUSTOM ADMIN SITE ----------------
@@ -17,36 +21,25 @@ class CustomAdminSite(admin.AdminSite):
         urls = super().get_urls()
         custom_urls = [
             path('dashboard/', self.admin_view(self.dashboard_view), name='dashboard'),
+            path('performance/', self.admin_view(self.performance_view), name='performance'),
         ]
         return custom_urls + urls
 
     def dashboard_view(self, request):
-        total_orders = Order.objects.count()
-        total_users = UserProfile.objects.count()
-        total_revenue = Order.objects.filter(
-            payment_status='PAID'
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-
-        order_status_count = {
-            'PLACED': Order.objects.filter(status='PLACED').count(),
-            'CONFIRMED': Order.objects.filter(status='CONFIRMED').count(),
-            'SHIPPED': Order.objects.filter(status='SHIPPED').count(),
-            'DELIVERED': Order.objects.filter(status='DELIVERED').count(),
-            'CANCELLED': Order.objects.filter(status='CANCELLED').count(),
-        }
-
-        low_stock_products = Product.objects.filter(stock__lte=5)
-
-        context = {
-            'total_orders': total_orders,
-            'total_users': total_users,
-            'total_revenue': total_revenue,
-            'order_status_count': order_status_count,
-            'low_stock_products': low_stock_products,
-        }
+        context = order_overview()
+        context.update({
+            'total_users': UserProfile.objects.count(),
+            'low_stock_products': Product.objects.filter(stock__lte=5),
+            'sales': sales_breakdown() if rollup_enabled() else None,
+        })
 
         return render(request, 'admin/dashboard.html', context)
 
+    def performance_view(self, request):
+        context = dict(self.each_context(request), **perf.summarize())
+        context['sample_rate'] = getattr(settings, 'PERF_SAMPLE_RATE', 0.0)
+        return render(request, 'admin/performance.html', context)
+
 
 # 🔑 CREATE ONE ADMIN SITE INSTANCE
 custom_admin_site = CustomAdminSite(name='custom_admin')
@@ -54,48 +47,58 @@ custom_admin_site = CustomAdminSite(name='custom_admin')
 
 # ---------------- ORDER ADMIN ACTIONS ----------------
 
-def mark_confirmed(modeladmin, request, queryset):
-    for order in queryset:
-        order.status = 'CONFIRMED'
-        order.save()
-        Notification.objects.create(
-            user=order.user,
-            message=f"📦 Your Order #{order.id} has been confirmed"
+def _transition(modeladmin, request, queryset, status, message):
+    selected = queryset.count()
+    changed = transition_orders(queryset, status, message)
+    label = dict(Order.STATUS_CHOICES)[status]
+
+    modeladmin.message_user(
+        request,
+        f"{changed} order(s) marked as {label}."
+    )
+    if changed < selected:
+        modeladmin.message_user(
+            request,
+            f"{selected - changed} order(s) skipped: they cannot move to {label} "
+            f"from their current status.",
+            level=messages.WARNING
         )
 
+
+def mark_confirmed(modeladmin, request, queryset):
+    _transition(modeladmin, request, queryset, 'CONFIRMED',
+                "📦 Your Order #{id} has been confirmed")
+
 mark_confirmed.short_description = "Mark selected orders as Confirmed"
 
 
 def mark_shipped(modeladmin, request, queryset):
-    for order in queryset:
-        order.status = 'SHIPPED'
-        order.save()
-        Notification.objects.create(
-            user=order.user,
-            message=f"🚚 Your Order #{order.id} has been shipped"
-        )
+    _transition(modeladmin, request, queryset, 'SHIPPED',
+                "🚚 Your Order #{id} has been shipped")
 
 mark_shipped.short_description = "Mark selected orders as Shipped"
 
 
 def mark_delivered(modeladmin, request, queryset):
-    for order in queryset:
-        order.status = 'DELIVERED'
-        order.save()
-        Notification.objects.create(
-            user=order.user,
-            message=f"✅ Your Order #{order.id} has been delivered"
-        )
+    _transition(modeladmin, request, queryset, 'DELIVERED',
+                "✅ Your Order #{id} has been delivered")
 
 mark_delivered.short_description = "Mark selected orders as Delivered"
 
 
+def mark_cancelled(modeladmin, request, queryset):
+    _transition(modeladmin, request, queryset, 'CANCELLED',
+                "❌ Order #{id} cancelled")
+
+mark_cancelled.short_description = "Cancel selected orders"
+
+
 # ---------------- ADMIN REGISTRATIONS ----------------
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ('product', 'price', 'quantity')
+    readonly_fields = ('product', 'category', 'price', 'quantity')
 
 
 @admin.register(Product, site=custom_admin_site)
@@ -104,6 +107,10 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ('category',)
     search_fields = ('name',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Served from the full-text index rather than search_fields scans.
+        return search_products(queryset, search_term, ranked=False), False
+
 
 @admin.register(Order, site=custom_admin_site)
 class OrderAdmin(admin.ModelAdmin):
@@ -113,9 +120,11 @@ class OrderAdmin(admin.ModelAdmin):
         'total_amount', 'created_at'
     )
     list_filter = ('status', 'payment_method', 'payment_status')
-    readonly_fields = ('payment_method', 'payment_status', 'total_amount', 'created_at')
+    # Status moves through the actions above, which enforce the allowed
+    # transitions, notify the customer and keep the sales rollup in step.
+    readonly_fields = ('status', 'payment_method', 'payment_status', 'total_amount', 'created_at')
     inlines = [OrderItemInline]
-    actions = [mark_confirmed, mark_shipped, mark_delivered]
+    actions = [mark_confirmed, mark_shipped, mark_delivered, mark_cancelled]
 
 
 @admin.register(UserProfile, site=custom_admin_site)
@@ -123,4 +132,11 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone')
 
 
+@admin.register(OutgoingEmail, site=custom_admin_site)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+
+
 custom_admin_site.register(Category)
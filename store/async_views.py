@@ -0,0 +1,119 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+
+from .catalog import get_catalog_page
+from .live import notification_events
+from .models import Notification, Product
+from .notifications import ainvalidate_notifications
+from .pagination import apaginate_keyset
+from .views import (
+    NOTIFICATIONS_ORDERING,
+    NOTIFICATIONS_PER_PAGE,
+    ORDERS_ORDERING,
+    ORDERS_PER_PAGE,
+    product_page,
+    user_orders,
+)
+
+
+# ================= ASYNC VIEWS =================
+#
+# Async twins of the read-heavy views in views.py, routed instead of them
+# when STORE_ASYNC_VIEWS is on (the ASGI deployment, see the Procfile).
+# Their own queries use the async ORM. Templates are still rendered in a
+# worker thread, because context processors and lazy template attributes
+# reach the ORM synchronously.
+
+arender = sync_to_async(render)
+
+
+async def _user(request):
+    # login_required already loaded the user through auser(); hand it to
+    # request.user too, or the context processors would query it again.
+    request.user = await request.auser()
+    return request.user
+
+
+@login_required
+async def home(request):
+    await _user(request)
+    # Grid pages are nearly always cache hits; a miss renders in a thread.
+    product_grid = await sync_to_async(get_catalog_page)(request.GET.get('after'))
+    return await arender(request, 'store/home.html', {
+        'product_grid': product_grid
+    })
+
+
+@login_required
+async def product_detail(request, product_id):
+    await _user(request)
+    product = await aget_object_or_404(Product, id=product_id)
+    return await sync_to_async(product_page)(request, product)
+
+
+@login_required
+async def my_orders(request):
+    page = await apaginate_keyset(
+        user_orders(await _user(request)),
+        ORDERS_ORDERING,
+        cursor=request.GET.get('after'),
+        per_page=ORDERS_PER_PAGE
+    )
+
+    return await arender(request, 'store/my_orders.html', {
+        'orders': page,
+        'next_cursor': page.next_cursor,
+        'is_first_page': not request.GET.get('after'),
+    })
+
+
+@login_required
+async def notifications_page(request):
+    user = await _user(request)
+    page = await apaginate_keyset(
+        Notification.objects.filter(user=user),
+        NOTIFICATIONS_ORDERING,
+        cursor=request.GET.get('after'),
+        per_page=NOTIFICATIONS_PER_PAGE
+    )
+
+    unread = [notification.pk for notification in page if not notification.is_read]
+    if unread:
+        await Notification.objects.filter(pk__in=unread).aupdate(is_read=True)
+        await ainvalidate_notifications(user.pk)
+
+    return await arender(request, 'store/notifications.html', {
+        'notifications': page,
+        'next_cursor': page.next_cursor,
+        'is_first_page': not request.GET.get('after'),
+    })
+
+
+# ================= LIVE NOTIFICATIONS =================
+#
+# Always routed here: the stream holds its connection open, which only an
+# ASGI server can afford. Anywhere else it answers 204, which tells
+# EventSource to stop reconnecting.
+
+def _last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id', '')
+    return int(value) if value.isdigit() else 0
+
+
+async def notification_stream(request):
+    if not settings.STORE_LIVE_NOTIFICATIONS:
+        return HttpResponse(status=204)
+    user = await _user(request)
+    if not user.is_authenticated:
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        notification_events(user.pk, _last_event_id(request)),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,307 @@
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+from itertools import islice
+
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+
+from .catalog import bump_cache_version, cache_version
+from .models import OrderItem, Product
+
+logger = logging.getLogger(__name__)
+
+
+# ================= AUTOCOMPLETE PREFIX INDEX =================
+#
+# Every worker keeps, in memory, the distinct tokens of all product names in
+# sorted order, each with its postings: the products containing it, most
+# popular (units sold) first. A prefix is a bisect into the token array;
+# its completions are the postings of the tokens in that range merged in
+# popularity order, so the scan stops as soon as enough matches are found.
+# One and two letter prefixes span too many tokens to merge per keystroke,
+# so their top products are precomputed. Requests never touch the database.
+#
+# The index is immutable once published: changes build a patched copy and
+# swap the module reference, so readers never see a half-applied update.
+# Saves in this process patch it straight away (see signals.py) and, when
+# a name was added, changed or removed, bump an autocomplete version in the
+# shared cache (CACHE_BACKEND=file). The worker that patched records the
+# bump as seen; the others notice it and rebuild in a background thread,
+# at most once per AUTOCOMPLETE_MIN_REBUILD_INTERVAL. Stock and price
+# changes leave the index, and its version, alone. A single locmem worker
+# has no others to tell; the AUTOCOMPLETE_MAX_AGE rebuild is a backstop
+# and also refreshes the popularity weights.
+
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_MAX_TERMS = 5
+AUTOCOMPLETE_MAX_SCAN = 5000
+AUTOCOMPLETE_CHECK_INTERVAL = 5
+AUTOCOMPLETE_MIN_REBUILD_INTERVAL = 60
+AUTOCOMPLETE_MAX_AGE = 60 * 60
+AUTOCOMPLETE_VERSION_KEY = 'autocomplete:version'
+
+TOP_PREFIX_LENGTH = 2
+TOP_PREFIX_SIZE = 64
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return re.findall(r'\w+', normalize(text or ''))
+
+
+def _short_prefixes(tokens):
+    return {token[:length] for token in tokens for length in range(1, TOP_PREFIX_LENGTH + 1)}
+
+
+class PrefixIndex:
+    def __init__(self, products, postings, top=None, tokens=None, built_at=None):
+        # products: {id: (name, weight, tokens)}
+        # postings: {token: [(-weight, id), ...] sorted}
+        self.products = products
+        self.postings = postings
+        self.tokens = sorted(postings) if tokens is None else tokens
+        self.top = top if top is not None else self._top_lists()
+        # Patched copies keep their parent's age; only a rebuild refreshes
+        # the popularity weights.
+        self.built_at = time.monotonic() if built_at is None else built_at
+
+    @classmethod
+    def from_rows(cls, rows):
+        products = {}
+        postings = defaultdict(list)
+        for pk, name, weight in rows:
+            tokens = tuple(set(tokenize(name)))
+            products[pk] = (name, weight, tokens)
+            for token in tokens:
+                postings[token].append((-weight, pk))
+        for entries in postings.values():
+            entries.sort()
+        return cls(products, dict(postings))
+
+    def _top_lists(self):
+        top = defaultdict(list)
+        for pk in sorted(self.products, key=lambda pk: (-self.products[pk][1], pk)):
+            for prefix in _short_prefixes(self.products[pk][2]):
+                if len(top[prefix]) < TOP_PREFIX_SIZE:
+                    top[prefix].append(pk)
+        return dict(top)
+
+    def _range(self, prefix):
+        return (
+            bisect_left(self.tokens, prefix),
+            bisect_left(self.tokens, prefix + '\U0010ffff'),
+        )
+
+    def _count(self, lo, hi):
+        return sum(map(len, map(self.postings.__getitem__, self.tokens[lo:hi])))
+
+    def _stream(self, lo, hi):
+        merged = heapq.merge(*(self.postings[token] for token in self.tokens[lo:hi]))
+        return (pk for _, pk in merged)
+
+    def complete(self, query, limit=AUTOCOMPLETE_LIMIT):
+        terms = tokenize(query)[:AUTOCOMPLETE_MAX_TERMS]
+        if not terms:
+            return []
+
+        # Walk the term with the fewest postings; the others only filter.
+        # One and two letter terms are broad by nature, so they are walked
+        # (from their top list) only when nothing longer was typed.
+        spans = []
+        for term in terms:
+            if len(term) <= TOP_PREFIX_LENGTH:
+                spans.append((True, len(self.top.get(term, ())), term))
+            else:
+                spans.append((False, self._count(*self._range(term)), term))
+        if not all(span[1] for span in spans):
+            return []
+        spans.sort()
+        short, _, term = spans[0]
+        others = [span[2] for span in spans[1:]]
+
+        if short:
+            stream = self.top[term]
+        else:
+            stream = self._stream(*self._range(term))
+
+        results = []
+        seen = set()
+        for pk in islice(stream, AUTOCOMPLETE_MAX_SCAN):
+            if pk in seen:
+                continue
+            seen.add(pk)
+            tokens = self.products[pk][2]
+            if all(any(token.startswith(other) for token in tokens) for other in others):
+                results.append((pk, self.products[pk][0]))
+                if len(results) == limit:
+                    break
+        return results
+
+    def patched(self, upserts=(), deletes=()):
+        products = dict(self.products)
+        postings = dict(self.postings)
+        top = dict(self.top)
+        touched = set()
+
+        def drop(pk):
+            name, weight, tokens = products.pop(pk)
+            for token in tokens:
+                entries = list(postings[token])
+                del entries[bisect_left(entries, (-weight, pk))]
+                if entries:
+                    postings[token] = entries
+                else:
+                    del postings[token]
+            for prefix in _short_prefixes(tokens):
+                # Removing an entry keeps the list a true top-N, just one
+                # shorter; the next rebuild fills it back up.
+                top[prefix] = [other for other in top[prefix] if other != pk]
+                if not top[prefix]:
+                    del top[prefix]
+            touched.update(tokens)
+            return weight
+
+        for pk in deletes:
+            if pk in products:
+                drop(pk)
+        for pk, name in upserts:
+            weight = drop(pk) if pk in products else 0
+            tokens = tuple(set(tokenize(name)))
+            products[pk] = (name, weight, tokens)
+            for token in tokens:
+                entries = list(postings.get(token, ()))
+                insort(entries, (-weight, pk))
+                postings[token] = entries
+            for prefix in _short_prefixes(tokens):
+                ranked = sorted(top.get(prefix, []) + [pk], key=lambda pk: (-products[pk][1], pk))
+                top[prefix] = ranked[:TOP_PREFIX_SIZE]
+            touched.update(tokens)
+
+        # Only a new or vanished token changes the sorted token array.
+        unchanged = all(token in postings and token in self.postings for token in touched)
+        tokens = self.tokens if unchanged else None
+        return PrefixIndex(products, postings, top=top, tokens=tokens, built_at=self.built_at)
+
+
+# ================= WORKER STATE =================
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+_rebuilding = False
+_last_check = 0.0
+_last_rebuild = 0.0
+
+
+def build_index():
+    sold = dict(
+        OrderItem.objects.values('product')
+        .annotate(units=Sum('quantity'))
+        .values_list('product', 'units')
+    )
+    rows = (
+        (pk, name, sold.get(pk, 0))
+        for pk, name in Product.objects.values_list('pk', 'name').iterator(chunk_size=5000)
+    )
+    return PrefixIndex.from_rows(rows)
+
+
+def _publish(index, version):
+    global _index, _index_version, _last_rebuild
+    with _lock:
+        _index = index
+        _index_version = version
+        _last_rebuild = time.monotonic()
+
+
+def index_version():
+    return cache_version(AUTOCOMPLETE_VERSION_KEY)
+
+
+def bump_index_version():
+    bump_cache_version(AUTOCOMPLETE_VERSION_KEY)
+
+
+def warm():
+    try:
+        version = index_version()
+        _publish(build_index(), version)
+    except DatabaseError as exc:
+        # e.g. a worker started before migrate; the first request retries.
+        logger.warning("Autocomplete index not built at startup: %s", exc)
+
+
+def _rebuild_in_background():
+    global _rebuilding
+    try:
+        warm()
+    finally:
+        connection.close()
+        _rebuilding = False
+
+
+def _maybe_refresh():
+    global _rebuilding, _last_check
+    now = time.monotonic()
+    if now - _last_check < AUTOCOMPLETE_CHECK_INTERVAL:
+        return
+    _last_check = now
+
+    stale = (
+        _index is None
+        or now - _index.built_at > AUTOCOMPLETE_MAX_AGE
+        or index_version() != _index_version
+    )
+    throttled = _index is not None and now - _last_rebuild < AUTOCOMPLETE_MIN_REBUILD_INTERVAL
+    if not stale or throttled:
+        return
+
+    with _lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+    threading.Thread(target=_rebuild_in_background, name='autocomplete-rebuild', daemon=True).start()
+
+
+def complete(query, limit=AUTOCOMPLETE_LIMIT):
+    _maybe_refresh()
+    index = _index
+    return index.complete(query, limit) if index is not None else []
+
+
+def _patch(upserts=(), deletes=()):
+    global _index, _index_version
+    with _lock:
+        if _index is None:
+            return
+        _index = _index.patched(upserts=upserts, deletes=deletes)
+        # Tell the other workers. This one is current unless someone else
+        # bumped in between, in which case it rebuilds like the rest.
+        seen = _index_version
+        _index_version = bump_cache_version(AUTOCOMPLETE_VERSION_KEY)
+        if seen is None or _index_version != seen + 1:
+            _index_version = None
+
+
+def product_saved(product_id, name):
+    index = _index
+    if index is not None and product_id in index.products and index.products[product_id][0] == name:
+        return
+    _patch(upserts=[(product_id, name)])
+
+
+def product_deleted(product_id):
+    index = _index
+    if index is not None and product_id not in index.products:
+        return
+    _patch(deletes=[product_id])
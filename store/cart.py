@@ -0,0 +1,176 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Least
+
+from .models import Cart, CartItem, Product
+
+
+# ================= CART RESOLUTION =================
+#
+# Checkout works on CartLine values rather than rows. resolve_cart builds
+# them from a {product_id: quantity} dict (older sessions stored the cart
+# that way) with a single in_bulk query.
+
+@dataclass(frozen=True)
+class CartLine:
+    product: Product
+    quantity: int
+
+    @property
+    def subtotal(self):
+        return self.product.price * self.quantity
+
+
+@dataclass(frozen=True)
+class ResolvedCart:
+    lines: list
+    stale_ids: list
+
+    @property
+    def total(self):
+        return sum((line.subtotal for line in self.lines), Decimal('0'))
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+
+def resolve_cart(cart):
+    wanted = {}
+    stale = []
+    for key, qty in cart.items():
+        try:
+            pid, qty = int(key), int(qty)
+        except (TypeError, ValueError):
+            stale.append(key)
+            continue
+        if qty <= 0:
+            stale.append(key)
+            continue
+        wanted[pid] = (key, qty)
+
+    products = Product.objects.in_bulk(list(wanted))
+
+    lines = []
+    for pid, (key, qty) in wanted.items():
+        product = products.get(pid)
+        if product is None:
+            stale.append(key)
+            continue
+        lines.append(CartLine(product=product, quantity=qty))
+
+    return ResolvedCart(lines=lines, stale_ids=stale)
+
+
+# ================= CART STORAGE =================
+#
+# Carts live in their own tables instead of the session, so a click is a
+# single-row UPDATE (or INSERT) on CartItem: two tabs adding at once both
+# count, and the session row is not rewritten on every change. A shopper's
+# cart is found through the unique user column. An anonymous cart's id is
+# written to the session once, when the cart is created, and the cart is
+# folded into the shopper's own on login. Shoppers who were already signed
+# in when carts left the session still have the old dict there; it is
+# folded in the first time their cart is loaded.
+
+CART_SESSION_KEY = 'cart_id'
+LEGACY_SESSION_KEY = 'cart'
+
+
+def cart_items(request):
+    if request.user.is_authenticated:
+        return CartItem.objects.filter(cart__user=request.user)
+    cart_id = request.session.get(CART_SESSION_KEY)
+    if cart_id is None:
+        return CartItem.objects.none()
+    return CartItem.objects.filter(cart_id=cart_id, cart__user=None)
+
+
+def get_cart(request):
+    if request.user.is_authenticated:
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        return cart
+
+    cart_id = request.session.get(CART_SESSION_KEY)
+    cart = Cart.objects.filter(pk=cart_id, user=None).first() if cart_id else None
+    if cart is None:
+        cart = Cart.objects.create()
+        request.session[CART_SESSION_KEY] = cart.pk
+    return cart
+
+
+def load_cart(request):
+    if request.user.is_authenticated and LEGACY_SESSION_KEY in request.session:
+        merge_anonymous_cart(request, request.user)
+    items = cart_items(request).select_related('product').order_by('pk')
+    return ResolvedCart(
+        lines=[CartLine(product=item.product, quantity=item.quantity) for item in items],
+        stale_ids=[]
+    )
+
+
+def add_item(cart, product, quantity=1):
+    line = CartItem.objects.filter(cart=cart, product=product)
+    increment = {'quantity': Least(F('quantity') + quantity, product.stock)}
+
+    if line.update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(cart=cart, product=product, quantity=min(quantity, product.stock))
+    except IntegrityError:
+        # Another request created the line first; this click still counts.
+        line.update(**increment)
+
+
+def increase_item(request, product):
+    cart_items(request).filter(
+        product=product,
+        quantity__lt=product.stock
+    ).update(quantity=F('quantity') + 1)
+
+
+def decrease_item(request, product_id):
+    line = cart_items(request).filter(product_id=product_id)
+    if not line.filter(quantity__gt=1).update(quantity=F('quantity') - 1):
+        line.delete()
+
+
+def remove_item(request, product_id):
+    cart_items(request).filter(product_id=product_id).delete()
+
+
+def clear_cart(request):
+    cart_items(request).delete()
+
+
+def merge_anonymous_cart(request, user):
+    cart_id = request.session.pop(CART_SESSION_KEY, None)
+    legacy = request.session.pop(LEGACY_SESSION_KEY, None)
+    if cart_id is None and not legacy:
+        return
+
+    wanted = defaultdict(int)
+    if cart_id is not None:
+        anonymous = CartItem.objects.filter(cart_id=cart_id, cart__user=None)
+        for product_id, quantity in anonymous.values_list('product_id', 'quantity'):
+            wanted[product_id] += quantity
+        Cart.objects.filter(pk=cart_id, user=None).delete()
+    if legacy:
+        for line in resolve_cart(legacy):
+            wanted[line.product.pk] += line.quantity
+    if not wanted:
+        return
+
+    cart, _ = Cart.objects.get_or_create(user=user)
+    products = Product.objects.in_bulk(list(wanted))
+    for product_id, quantity in wanted.items():
+        product = products.get(product_id)
+        if product is not None and product.stock > 0:
+            add_item(cart, product, quantity)
@@ -0,0 +1,171 @@
+import hashlib
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .metrics import record_cache_lookup
+from .models import Product
+from .pagination import normalize_cursor, paginate_keyset, paginate_window
+from .search import search_products, search_terms
+
+
+# ================= CATALOG PAGE CACHE =================
+#
+# Rendered grid pages are cached under a catalog version number. Saving or
+# deleting a product bumps the version (see signals.py), which orphans every
+# cached page at once instead of hunting down individual keys. The version
+# lives in the default cache, so every worker must share it (see
+# CACHE_BACKEND in settings).
+
+CATALOG_PAGE_SIZE = 24
+CATALOG_ORDERING = ('id',)
+CATALOG_CACHE_TIMEOUT = 60 * 15
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def cache_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version lost to eviction can never
+        # collide with pages cached under an earlier number.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return cache_version(key)
+
+
+def catalog_version():
+    return cache_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    bump_cache_version(CATALOG_VERSION_KEY)
+
+
+def catalog_queryset():
+    return Product.objects.select_related('category')
+
+
+def get_catalog_page(cursor=None):
+    # Malformed cursors all mean the first page, and share its entry.
+    cursor = normalize_cursor(cursor, CATALOG_ORDERING, Product) or ''
+    key = 'catalog:v%s:page:%s' % (
+        catalog_version(),
+        hashlib.md5(cursor.encode()).hexdigest(),
+    )
+
+    html = cache.get(key)
+    record_cache_lookup('catalog', html is not None)
+    if html is None:
+        page = paginate_keyset(
+            catalog_queryset(),
+            CATALOG_ORDERING,
+            cursor=cursor,
+            per_page=CATALOG_PAGE_SIZE,
+        )
+        html = render_to_string('store/partials/product_grid.html', {
+            'products': page.object_list,
+            'next_cursor': page.next_cursor,
+            'is_first_page': not cursor,
+        })
+        cache.set(key, str(html), CATALOG_CACHE_TIMEOUT)
+
+    return mark_safe(html)
+
+
+# ================= CATEGORY BROWSING =================
+#
+# Category pages read product_category_price_idx: the price filter is a
+# range on (category, price) and pages continue from the last (price, id)
+# shown. A search query switches to relevance order (see search.py). The
+# price histogram next to the filter is an aggregate over the whole
+# category, so it is cached under the catalog version like the grid.
+
+CATEGORY_PAGE_SIZE = 24
+CATEGORY_ORDERING = ('price', 'id')
+PRICE_BUCKET_COUNT = 6
+PRICE_STEP = Decimal('0.01')
+SEARCH_RESULT_LIMIT = CATEGORY_PAGE_SIZE * 20
+
+
+def category_products_page(category, cursor=None, min_price=None, max_price=None, query=''):
+    products = Product.objects.filter(category=category)
+    if min_price is not None:
+        products = products.filter(price__gte=min_price)
+    if max_price is not None:
+        products = products.filter(price__lte=max_price)
+    if search_terms(query):
+        return paginate_window(
+            search_products(products, query),
+            cursor=cursor,
+            per_page=CATEGORY_PAGE_SIZE,
+            max_rows=SEARCH_RESULT_LIMIT
+        )
+
+    return paginate_keyset(
+        products,
+        CATEGORY_ORDERING,
+        cursor=cursor,
+        per_page=CATEGORY_PAGE_SIZE
+    )
+
+
+def _bucket_width(low, high):
+    # Round the width up to 1, 2 or 5 times a power of ten so the bucket
+    # edges are prices people would type into the filter.
+    raw = max((high - low) / PRICE_BUCKET_COUNT, Decimal(1))
+    magnitude = Decimal(10) ** (len(str(int(raw))) - 1)
+    for factor in (1, 2, 5, 10):
+        if raw <= magnitude * factor:
+            return magnitude * factor
+    return magnitude * 10
+
+
+def _price_histogram(category):
+    bounds = Product.objects.filter(category=category).aggregate(low=Min('price'), high=Max('price'))
+    if bounds['low'] is None:
+        return []
+
+    width = _bucket_width(bounds['low'], bounds['high'])
+    start = (bounds['low'] // width) * width
+    edges = []
+    while start <= bounds['high']:
+        edges.append((start, start + width))
+        start += width
+
+    counts = Product.objects.filter(category=category).aggregate(**{
+        f'bucket_{index}': Count('pk', filter=Q(price__gte=low, price__lt=high))
+        for index, (low, high) in enumerate(edges)
+    })
+
+    return [
+        {
+            'min_price': low,
+            'max_price': high - PRICE_STEP,
+            'upper': high,
+            'count': counts[f'bucket_{index}'],
+        }
+        for index, (low, high) in enumerate(edges)
+    ]
+
+
+def get_price_histogram(category):
+    key = 'catalog:v%s:category:%s:histogram' % (catalog_version(), category.pk)
+
+    histogram = cache.get(key)
+    record_cache_lookup('category_histogram', histogram is not None)
+    if histogram is None:
+        histogram = _price_histogram(category)
+        cache.set(key, histogram, CATALOG_CACHE_TIMEOUT)
+
+    return histogram
@@ -1,16 +1,17 @@
-from .models import Notification
+from django.conf import settings
+
+from .notifications import unread_summary
 
 def notifications(request):
     if request.user.is_authenticated:
-        unread = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        )
+        summary = unread_summary(request.user)
         return {
-            'unread_count': unread.count(),
-            'notifications': unread[:5]
+            'unread_count': summary['unread_count'],
+            'notifications': summary['latest'],
+            'live_notifications': settings.STORE_LIVE_NOTIFICATIONS
         }
     return {
         'unread_count': 0,
-        'notifications': []
+        'notifications': [],
+        'live_notifications': False
     }
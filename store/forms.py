@@ -0,0 +1,18 @@
+from django.contrib.auth.forms import PasswordResetForm
+from django.template import loader
+
+from .mail import enqueue_mail
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    def send_mail(self, subject_template_name, email_template_name, context,
+                  from_email, to_email, html_email_template_name=None):
+        subject = loader.render_to_string(subject_template_name, context)
+        subject = ''.join(subject.splitlines())
+        body = loader.render_to_string(email_template_name, context)
+
+        html_body = ''
+        if html_email_template_name is not None:
+            html_body = loader.render_to_string(html_email_template_name, context)
+
+        enqueue_mail(subject, body, [to_email], from_email=from_email, html_message=html_body)
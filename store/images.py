@@ -0,0 +1,101 @@
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+# ================= PRODUCT IMAGE VARIANTS =================
+#
+# Every product upload gets resized copies next to it under derived/, in
+# WebP and JPEG, so listing pages never ship the original photo. Names are
+# derived from the original file name, so a new upload gets new variants
+# and nothing has to be stored on the model.
+
+IMAGE_VARIANTS = {
+    'thumb': 400,
+    'medium': 900,
+}
+
+IMAGE_FORMATS = (
+    ('webp', 'WEBP'),
+    ('jpg', 'JPEG'),
+)
+
+IMAGE_QUALITY = 80
+
+# JPEG has no alpha channel; transparent areas are laid over this instead
+# of turning black.
+IMAGE_BACKGROUND = (255, 255, 255)
+
+
+def variant_name(image_name, variant, ext):
+    stem, _ = os.path.splitext(image_name)
+    return f"derived/{stem}_{variant}.{ext}"
+
+
+def has_variants(image_name):
+    return default_storage.exists(variant_name(image_name, 'thumb', 'jpg'))
+
+
+def variant_srcset(image_name, ext):
+    return ', '.join(
+        f"{default_storage.url(variant_name(image_name, variant, ext))} {width}w"
+        for variant, width in IMAGE_VARIANTS.items()
+    )
+
+
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, IMAGE_BACKGROUND)
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, fmt):
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        image = _flatten(image)
+    buffer = BytesIO()
+    image.save(buffer, fmt, quality=IMAGE_QUALITY, optimize=fmt == 'JPEG')
+    return buffer.getvalue()
+
+
+def generate_variants(product, force=False):
+    if not product.image or not product.image.storage.exists(product.image.name):
+        return 0
+
+    names = {
+        (variant, ext): variant_name(product.image.name, variant, ext)
+        for variant in IMAGE_VARIANTS
+        for ext, _ in IMAGE_FORMATS
+    }
+    if not force and all(default_storage.exists(name) for name in names.values()):
+        return 0
+
+    try:
+        with product.image.open('rb') as source:
+            original = ImageOps.exif_transpose(Image.open(source))
+            original.load()
+    except (OSError, ValueError) as exc:
+        logger.warning("Cannot build image variants for product %s: %s", product.pk, exc)
+        return 0
+
+    written = 0
+    for variant, width in IMAGE_VARIANTS.items():
+        resized = original.copy()
+        resized.thumbnail((width, width), Image.Resampling.LANCZOS)
+
+        for ext, fmt in IMAGE_FORMATS:
+            name = names[(variant, ext)]
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(_encode(resized, fmt)))
+            written += 1
+
+    return written
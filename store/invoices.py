@@ -0,0 +1,116 @@
+import hashlib
+import os
+import tempfile
+import textwrap
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Order, OrderItem
+from .pdf import render_text_pdf
+
+
+# ================= INVOICES =================
+#
+# An order in a terminal status never changes again, so its invoice is
+# rendered once (HTML fragment and PDF) and kept on disk. Later requests
+# read the snapshot instead of touching the order items at all. Snapshots
+# live outside MEDIA_ROOT because invoices are private.
+#
+# The file name carries a digest of who the order belongs to, when it was
+# placed and how it ended. Order ids come back after a flush or a restore
+# from backup, and a snapshot left over from the earlier order must never
+# be served for the new one; it simply stops matching and is re-rendered.
+
+TERMINAL_STATUSES = ('DELIVERED', 'CANCELLED')
+
+
+def items_prefetch():
+    return Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('pk'))
+
+
+def orders_with_items():
+    return Order.objects.select_related('user').prefetch_related(items_prefetch())
+
+
+def _snapshot_key(order):
+    identity = f"{order.pk}:{order.user_id}:{order.created_at.isoformat()}:{order.status}:{order.total_amount}"
+    return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+
+def _snapshot_path(order, ext):
+    return Path(settings.INVOICE_SNAPSHOT_ROOT) / f"invoice-{order.pk}-{_snapshot_key(order)}.{ext}"
+
+
+def _write_atomically(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.invoice-')
+    with os.fdopen(fd, 'wb') as handle:
+        handle.write(content)
+    os.replace(tmp, path)
+
+
+def _invoice_lines(order):
+    lines = [
+        "SMART SHOP",
+        "",
+        f"Invoice #: {order.id}",
+        f"Date:      {timezone.localtime(order.created_at):%d %b %Y, %I:%M %p}",
+        f"Status:    {order.get_status_display()}",
+        "",
+        "Billed To:",
+        f"  {order.user.username}",
+    ]
+    for line in order.address.splitlines() or ['']:
+        lines.extend(f"  {part}" for part in textwrap.wrap(line, 70) or [''])
+
+    lines += [
+        "",
+        f"Payment:   {order.get_payment_method_display()} ({order.get_payment_status_display()})",
+        "",
+        f"{'Product':<46}{'Qty':>6}{'Price':>16}",
+        "-" * 68,
+    ]
+    for item in order.items.all():
+        name = textwrap.shorten(item.product.name, 44, placeholder='...')
+        lines.append(f"{name:<46}{item.quantity:>6}{'Rs. ' + str(item.price):>16}")
+
+    lines += [
+        "-" * 68,
+        f"{'Total Amount':<52}{'Rs. ' + str(order.total_amount):>16}",
+        "",
+        "This is a system-generated invoice and does not require a signature.",
+    ]
+    return lines
+
+
+def _render(order, ext):
+    if not hasattr(order, '_prefetched_objects_cache') or 'items' not in order._prefetched_objects_cache:
+        prefetch_related_objects([order], items_prefetch())
+
+    if ext == 'pdf':
+        return render_text_pdf(_invoice_lines(order), title=f"Invoice #{order.id}")
+    return render_to_string('store/partials/invoice_body.html', {'order': order}).encode()
+
+
+def get_invoice(order, ext):
+    if order.status not in TERMINAL_STATUSES:
+        return _render(order, ext)
+
+    path = _snapshot_path(order, ext)
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        content = _render(order, ext)
+        _write_atomically(path, content)
+        return content
+
+
+def invoice_etag(content, *extra):
+    digest = hashlib.sha256(content)
+    for part in extra:
+        digest.update(str(part).encode())
+    return f'"{digest.hexdigest()[:40]}"'
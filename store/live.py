@@ -0,0 +1,176 @@
+import asyncio
+import json
+import weakref
+
+from django.db.models import Count, Max
+
+from .models import Notification
+from .notifications import NOTIFICATION_PREVIEW_SIZE
+
+
+# ================= LIVE NOTIFICATIONS =================
+#
+# Signed-in pages keep an EventSource open on notifications/stream/ (ASGI
+# deployments only, see STORE_LIVE_NOTIFICATIONS) and update the bell as
+# notifications arrive instead of waiting for the next page render.
+#
+# Each worker runs one broker per event loop. A single task polls for
+# Notification rows newer than the last one it saw and fans them out to
+# the queues of the connected users, so any number of open tabs costs one
+# query per poll interval (plus one unread count when something arrived).
+# The poller only runs while someone is connected.
+#
+# Event ids are notification ids. A reconnecting browser sends the last id
+# it saw as Last-Event-ID and the stream first replays the unread
+# notifications newer than that. The replay only runs once the broker has
+# fixed its starting cursor, so every notification is either in the replay
+# or newer than the cursor; the id check in the stream drops the overlap.
+#
+# The poller relies on ids growing in commit order. That holds on SQLite,
+# which has a single writer. On PostgreSQL a transaction that commits late
+# can land below the cursor; that notification is not pushed, but it is
+# on the notifications page and in the next reconnect's replay.
+
+LIVE_POLL_INTERVAL = 2
+LIVE_POLL_BATCH = 500
+LIVE_HEARTBEAT_INTERVAL = 15
+LIVE_QUEUE_SIZE = 100
+LIVE_REPLAY_LIMIT = NOTIFICATION_PREVIEW_SIZE
+# Streams end after this long and the browser reconnects, so a logout or
+# password change is picked up without holding the connection forever.
+LIVE_STREAM_MAX_AGE = 60 * 15
+LIVE_RETRY_MS = 5000
+
+
+async def _unread_counts(user_ids):
+    counts = (
+        Notification.objects.filter(user_id__in=user_ids, is_read=False)
+        .values('user')
+        .annotate(unread=Count('id'))
+        .values_list('user', 'unread')
+    )
+    return {user_id: unread async for user_id, unread in counts}
+
+
+class Broker:
+    def __init__(self):
+        self.subscribers = {}
+        self.cursor = None
+        self.started = None
+        self.task = None
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        if self.task is None or self.task.done():
+            self.started = asyncio.create_task(self.start())
+            self.task = asyncio.create_task(self.run())
+        return queue
+
+    async def start(self):
+        # Anything older is covered by each stream's own replay.
+        self.cursor = (await Notification.objects.aaggregate(last=Max('pk')))['last'] or 0
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    async def run(self):
+        try:
+            await self.started
+            while self.subscribers:
+                await asyncio.sleep(LIVE_POLL_INTERVAL)
+                await self.poll()
+        finally:
+            self.cursor = None
+
+    async def poll(self):
+        while True:
+            rows = [
+                row async for row in Notification.objects.filter(pk__gt=self.cursor)
+                .order_by('pk')
+                .values('id', 'user_id', 'message')[:LIVE_POLL_BATCH]
+            ]
+            if not rows:
+                return
+            self.cursor = rows[-1]['id']
+
+            wanted = [row for row in rows if row['user_id'] in self.subscribers]
+            if wanted:
+                counts = await _unread_counts({row['user_id'] for row in wanted})
+                for row in wanted:
+                    self.publish(row['user_id'], {
+                        'id': row['id'],
+                        'message': row['message'],
+                        'unread_count': counts.get(row['user_id'], 0),
+                    })
+
+            if len(rows) < LIVE_POLL_BATCH:
+                return
+
+    def publish(self, user_id, event):
+        for queue in self.subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A stalled tab; the next event carries the current count.
+                pass
+
+
+_brokers = weakref.WeakKeyDictionary()
+
+
+def get_broker():
+    loop = asyncio.get_running_loop()
+    broker = _brokers.get(loop)
+    if broker is None:
+        broker = _brokers[loop] = Broker()
+    return broker
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: notification\ndata: {json.dumps(event)}\n\n"
+
+
+async def missed_events(user_id, last_id):
+    unread = Notification.objects.filter(user_id=user_id, is_read=False)
+    missed = [
+        row async for row in unread.filter(pk__gt=last_id)
+        .order_by('-pk')
+        .values('id', 'message')[:LIVE_REPLAY_LIMIT]
+    ]
+    if not missed:
+        return []
+    unread_count = await unread.acount()
+    return [dict(row, unread_count=unread_count) for row in reversed(missed)]
+
+
+async def notification_events(user_id, last_id=0):
+    loop = asyncio.get_running_loop()
+    broker = get_broker()
+    # Subscribe, and let the broker fix its cursor, before replaying, so
+    # nothing lands in between.
+    queue = broker.subscribe(user_id)
+    try:
+        await asyncio.shield(broker.started)
+        yield f'retry: {LIVE_RETRY_MS}\n\n'
+        for event in await missed_events(user_id, last_id):
+            last_id = event['id']
+            yield format_event(event)
+
+        deadline = loop.time() + LIVE_STREAM_MAX_AGE
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(queue.get(), min(LIVE_HEARTBEAT_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection.
+                yield ': keepalive\n\n'
+                continue
+            if event['id'] > last_id:
+                last_id = event['id']
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(user_id, queue)
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+
+# ================= OUTBOUND EMAIL QUEUE =================
+#
+# Requests never talk to SMTP. They write an OutgoingEmail row and return;
+# the send_queued_mail command drains the table in batches over a single
+# SMTP connection, retrying failures with exponential backoff.
+
+MAIL_BATCH_SIZE = 50
+MAIL_MAX_ATTEMPTS = 5
+MAIL_RETRY_BASE_DELAY = 60
+MAIL_RETRY_MAX_DELAY = 60 * 60
+MAIL_CLAIM_TIMEOUT = 5 * 60
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None, html_message=''):
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list)
+    )
+
+
+def retry_delay(attempts):
+    delay = MAIL_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, MAIL_RETRY_MAX_DELAY))
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        # Push the claimed rows into the future so a second worker (or a
+        # crashed one) doesn't pick them up again straight away.
+        OutgoingEmail.objects.filter(
+            pk__in=[email.pk for email in batch]
+        ).update(next_attempt_at=now + timedelta(seconds=MAIL_CLAIM_TIMEOUT))
+    return batch
+
+
+def _record_failure(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = 'FAILED'
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def send_queued_mail(batch_size=MAIL_BATCH_SIZE, max_attempts=MAIL_MAX_ATTEMPTS):
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    sent = []
+    failed = 0
+    connection = get_connection()
+
+    try:
+        connection.open()
+    except Exception as exc:
+        for email in batch:
+            _record_failure(email, exc, max_attempts)
+        return 0, len(batch)
+
+    try:
+        for email in batch:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.recipients,
+                connection=connection
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+
+            try:
+                message.send()
+            except Exception as exc:
+                _record_failure(email, exc, max_attempts)
+                failed += 1
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+
+    OutgoingEmail.objects.filter(pk__in=sent).update(
+        status='SENT',
+        sent_at=timezone.now(),
+        attempts=F('attempts') + 1,
+        last_error=''
+    )
+    return len(sent), failed
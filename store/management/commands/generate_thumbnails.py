@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from store.images import generate_variants
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Create missing thumbnail and medium image variants for existing products."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Regenerate variants even when they already exist."
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').only('id', 'image').order_by('pk')
+
+        processed = written = 0
+        for product in products.iterator(chunk_size=500):
+            written += generate_variants(product, force=options['force'])
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {processed} products, wrote {written} image files."
+        ))
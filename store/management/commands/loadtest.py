@@ -0,0 +1,83 @@
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from store.seeding import SEED_USERNAME_PREFIX
+
+DEFAULT_PATHS = ['/', '/my-orders/', '/notifications/']
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GETs at a running server (WSGI or ASGI) as a signed-in "
+        "seeded shopper and report throughput and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help="e.g. http://127.0.0.1:8000")
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help="Path to request; repeatable. Defaults to home, my orders and notifications."
+        )
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--user', default=f'{SEED_USERNAME_PREFIX}0')
+        parser.add_argument('--timeout', type=float, default=30.0)
+
+    def session_cookie(self, username):
+        # Same session a real login would leave, without the form round trip.
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"No user {username!r}; run seed_store first.")
+        session = import_string(f'{settings.SESSION_ENGINE}.SessionStore')()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def handle(self, *args, **options):
+        cookie = self.session_cookie(options['user'])
+        base_url = options['base_url'].rstrip('/')
+        urls = cycle(base_url + path for path in options['paths'] or DEFAULT_PATHS)
+        targets = [next(urls) for _ in range(options['requests'])]
+
+        def fetch(url):
+            request = urllib.request.Request(url, headers={'Cookie': cookie})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=options['timeout']) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return time.perf_counter() - start, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fetch, targets))
+        elapsed = time.perf_counter() - started
+
+        timings = sorted(seconds * 1000 for seconds, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+
+        def percentile(fraction):
+            return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+        self.stdout.write(
+            f"{len(results)} requests, concurrency {options['concurrency']}: "
+            f"{len(results) / elapsed:.1f} req/s, "
+            f"p50 {percentile(0.5):.1f}ms, p95 {percentile(0.95):.1f}ms, "
+            f"p99 {percentile(0.99):.1f}ms, errors {errors}"
+        )
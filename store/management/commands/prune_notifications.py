@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.notifications import (
+    NOTIFICATION_PRUNE_BATCH_SIZE,
+    compact_notifications,
+    prune_expired_notifications,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete notifications older than NOTIFICATION_RETENTION_DAYS and all but "
+        "each user's newest NOTIFICATION_MAX_PER_USER, in small batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=NOTIFICATION_PRUNE_BATCH_SIZE)
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches."
+        )
+
+    def handle(self, *args, **options):
+        expired = prune_expired_notifications(options['batch_size'], options['pause'])
+        overflow = compact_notifications(options['batch_size'], options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {expired} notifications older than "
+            f"{settings.NOTIFICATION_RETENTION_DAYS} days and {overflow} beyond "
+            f"{settings.NOTIFICATION_MAX_PER_USER} per user."
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from store.sessions import SESSION_PRUNE_BATCH_SIZE, prune_anonymous_carts, prune_expired_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions, and anonymous carts older than SESSION_COOKIE_AGE, "
+        "in small batches so the site keeps writing while it runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SESSION_PRUNE_BATCH_SIZE)
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches."
+        )
+
+    def handle(self, *args, **options):
+        sessions = prune_expired_sessions(options['batch_size'], options['pause'])
+        carts = prune_anonymous_carts(options['batch_size'], options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {sessions} expired sessions and {carts} abandoned carts."
+        ))
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.stats import rebuild_sales_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailySalesStats rollup from orders (run periodically to correct drift)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help="Only rebuild the last N days instead of the whole history."
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days']:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        rows = rebuild_sales_stats(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily sales rows."))
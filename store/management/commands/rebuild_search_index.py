@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the SQLite full-text product index from the products table "
+        "(after bulk loads that bypass signals). PostgreSQL needs no rebuild."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {rows} products."))
@@ -0,0 +1,79 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from store.seeding import (
+    SEED_BATCH_SIZE,
+    SEED_PASSWORD,
+    SEED_USERNAME_PREFIX,
+    scaled_sizes,
+    seed_store,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill an empty store with generated categories, products, users, orders and "
+        "notifications for benchmarks and load tests. The same --seed gives the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=0.01,
+            help=(
+                "Fraction of the full dataset "
+                "(1.0 = 100k products, 2k users, 1M orders, 200k notifications)."
+            )
+        )
+        parser.add_argument('--categories', type=int, help="Override the number of categories.")
+        parser.add_argument('--products', type=int, help="Override the number of products.")
+        parser.add_argument('--users', type=int, help="Override the number of users.")
+        parser.add_argument('--orders', type=int, help="Override the number of orders.")
+        parser.add_argument('--items-per-order', type=int, help="Average items per order.")
+        parser.add_argument('--notifications', type=int, help="Override the number of notifications.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (default 0).")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SEED_BATCH_SIZE,
+            help="Rows per bulk insert."
+        )
+        parser.add_argument(
+            '--no-images',
+            action='store_true',
+            help="Don't write placeholder images to media storage."
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username=f'{SEED_USERNAME_PREFIX}0').exists():
+            raise CommandError("The store already holds seeded data; flush the database first.")
+
+        sizes = scaled_sizes(
+            options['scale'],
+            categories=options['categories'],
+            products=options['products'],
+            users=options['users'],
+            orders=options['orders'],
+            items_per_order=options['items_per_order'],
+            notifications=options['notifications']
+        )
+        started = time.monotonic()
+
+        def log(message):
+            self.stdout.write(f"[{time.monotonic() - started:7.1f}s] {message}")
+
+        seed_store(
+            sizes,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            images=not options['no_images'],
+            log=log
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded the store in {time.monotonic() - started:.1f}s. "
+            f"Users {SEED_USERNAME_PREFIX}0..{sizes['users'] - 1} log in with '{SEED_PASSWORD}'."
+        ))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.mail import MAIL_BATCH_SIZE, MAIL_MAX_ATTEMPTS, send_queued_mail
+
+
+class Command(BaseCommand):
+    help = "Send queued outgoing emails in batches over one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=MAIL_BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=MAIL_MAX_ATTEMPTS)
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep running and poll for new mail instead of exiting when the queue is empty."
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls when the queue is empty (with --loop)."
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+
+        while True:
+            sent, failed = send_queued_mail(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts']
+            )
+            total_sent += sent
+            total_failed += failed
+
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}.")
+                continue
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Queue drained: {total_sent} sent, {total_failed} failed."
+        ))
@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+
+# ================= PROMETHEUS METRICS =================
+#
+# Every gunicorn worker keeps its own counters in memory and periodically
+# adds them into a shared SQLite file (an atomic UPSERT ... value + delta),
+# so a scrape that lands on any one worker sees the totals of all of them.
+# Nothing here touches the application database.
+
+METRICS_FLUSH_INTERVAL = 1.0
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FAMILIES = {
+    'store_http_request_duration_seconds': (
+        'histogram', 'Request latency by URL name.'
+    ),
+    'store_orders_placed_total': ('counter', 'Orders placed.'),
+    'store_orders_cancelled_total': ('counter', 'Orders cancelled.'),
+    'store_checkout_failures_total': ('counter', 'Checkouts rejected, by reason.'),
+    'store_stock_outs_total': ('counter', 'Products sold down to zero stock.'),
+    'store_cache_requests_total': ('counter', 'Application cache lookups, by cache and result.'),
+    'store_cache_hit_ratio': ('gauge', 'Share of cache lookups that were hits.'),
+    'store_email_queue_depth': ('gauge', 'Outgoing emails waiting to be sent.'),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+
+
+class SharedStore:
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        # A connection inherited across fork() must not be reused.
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path,
+                timeout=5,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS metrics ('
+                ' name TEXT NOT NULL,'
+                ' labels TEXT NOT NULL,'
+                ' value REAL NOT NULL,'
+                ' PRIMARY KEY (name, labels))'
+            )
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def add(self, deltas):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                [(name, labels, value) for (name, labels), value in deltas.items()]
+            )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def read(self):
+        return self._connect().execute(
+            'SELECT name, labels, value FROM metrics ORDER BY name, labels'
+        ).fetchall()
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)
+        self._last_flush = 0.0
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = SharedStore(settings.METRICS_DB_PATH)
+        return self._store
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_text(labels))
+        with self._lock:
+            self._pending[key] += amount
+
+    def observe(self, name, value, **labels):
+        label_text = _label_text(labels)
+        prefix = f'{label_text},' if label_text else ''
+        with self._lock:
+            # Every bucket is written (even with 0) so each series exists
+            # from the first observation onwards.
+            for bound in LATENCY_BUCKETS:
+                self._pending[(f'{name}_bucket', f'{prefix}le="{bound}"')] += value <= bound
+            self._pending[(f'{name}_bucket', f'{prefix}le="+Inf"')] += 1
+            self._pending[(f'{name}_sum', label_text)] += value
+            self._pending[(f'{name}_count', label_text)] += 1
+
+    def flush_due(self):
+        return bool(self._pending) and time.monotonic() - self._last_flush >= METRICS_FLUSH_INTERVAL
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending or (not force and now - self._last_flush < METRICS_FLUSH_INTERVAL):
+                return
+            pending, self._pending = self._pending, defaultdict(float)
+            self._last_flush = now
+
+        try:
+            self.store.add(pending)
+        except sqlite3.Error:
+            # Keep the deltas for the next attempt rather than losing them.
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] += value
+
+
+registry = Registry()
+
+inc = registry.inc
+observe = registry.observe
+
+
+def record_cache_lookup(cache_name, hit):
+    registry.inc('store_cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+# ================= EXPOSITION =================
+
+def _family(name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+            return name[:-len(suffix)]
+    return name
+
+
+def _sample_order(sample):
+    name, labels, _ = sample
+    others, le = [], None
+    for part in labels.split(',') if labels else []:
+        key, value = part.split('=', 1)
+        if key == 'le':
+            le = float(value.strip('"'))
+        else:
+            others.append(part)
+    return ','.join(others), name, le or 0.0
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics(gauges=None):
+    registry.flush(force=True)
+    rows = registry.store.read()
+
+    families = defaultdict(list)
+    cache_totals = defaultdict(lambda: {'hit': 0.0, 'miss': 0.0})
+    for name, labels, value in rows:
+        families[_family(name)].append((name, labels, value))
+        if name == 'store_cache_requests_total':
+            parts = dict(part.split('=', 1) for part in labels.split(','))
+            cache_totals[parts['cache']][parts['result'].strip('"')] += value
+
+    for cache_name, totals in cache_totals.items():
+        lookups = totals['hit'] + totals['miss']
+        families['store_cache_hit_ratio'].append((
+            'store_cache_hit_ratio',
+            f'cache={cache_name}',
+            totals['hit'] / lookups if lookups else 0.0
+        ))
+
+    for name, value in (gauges or {}).items():
+        families[name].append((name, '', value))
+
+    lines = []
+    for family in sorted(families):
+        kind, help_text = FAMILIES.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for name, labels, value in sorted(families[family], key=_sample_order):
+            label_part = f'{{{labels}}}' if labels else ''
+            lines.append(f'{name}{label_part} {_format_value(value)}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,98 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, perf
+
+
+# Both middlewares come first in MIDDLEWARE, so if either were sync-only
+# Django would run the whole chain, async views included, through
+# async_to_sync in a thread under ASGI.
+
+class HybridMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+# ================= PERFORMANCE SAMPLING =================
+
+class PerformanceMiddleware(HybridMiddleware):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 0.0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        perf.install_template_timer()
+        perf.install_query_timer()
+
+    def handle(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        stats, token = perf.start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            perf.finish_request(token)
+
+        perf.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        stats, token = perf.start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            perf.finish_request(token)
+
+        perf.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+
+# ================= PROMETHEUS METRICS =================
+
+class MetricsMiddleware(HybridMiddleware):
+    def observe(self, request, start):
+        match = getattr(request, 'resolver_match', None)
+        metrics.observe(
+            'store_http_request_duration_seconds',
+            time.perf_counter() - start,
+            url_name=match.view_name if match else 'unmatched',
+            method=request.method
+        )
+
+    def handle(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, start)
+        metrics.registry.flush()
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, start)
+        # Writing the shared file can wait on its lock; keep that off the
+        # event loop, and only hop threads when a flush is due.
+        if metrics.registry.flush_due():
+            await sync_to_async(metrics.registry.flush, thread_sensitive=False)()
+        return response
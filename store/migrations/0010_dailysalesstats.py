@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_emailverificationtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_method', models.CharField(choices=[('COD', 'Cash on Delivery'), ('ONLINE', 'Online Payment')], max_length=10)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily sales stats',
+                'constraints': [models.UniqueConstraint(fields=('date', 'category', 'payment_method'), name='unique_daily_sales_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+# Vendor-specific full-text index for store/search.py. The PostgreSQL
+# expression must stay identical to search.search_vector() or the planner
+# will not use the index.
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE store_product_fts USING fts5("
+            "name, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO store_product_fts (rowid, name, description) "
+            "SELECT id, name, description FROM store_product"
+        )
+    elif vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+
+        Product = apps.get_model('store', 'Product')
+        schema_editor.add_index(Product, GinIndex(
+            SearchVector('name', weight='A', config='english')
+            + SearchVector('description', weight='B', config='english'),
+            name='product_search_idx'
+        ))
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS store_product_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS product_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_product_category_price_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
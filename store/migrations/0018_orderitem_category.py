@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# Existing items take their product's current category; that is the best
+# record there is of where they were sold.
+
+def backfill_categories(apps, schema_editor):
+    OrderItem = apps.get_model('store', 'OrderItem')
+    Product = apps.get_model('store', 'Product')
+    OrderItem.objects.update(category_id=Subquery(
+        Product.objects.filter(pk=OuterRef('product_id')).values('category_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_product_search_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.category'),
+        ),
+        migrations.RunPython(backfill_categories, migrations.RunPython.noop),
+    ]
@@ -16,6 +16,9 @@ class Category(models.Model):
 
 # ================= PRODUCT =================
 
+LOW_STOCK_THRESHOLD = 5
+
+
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
@@ -23,10 +26,52 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
     image = models.ImageField(upload_to='products/')
+    # Version stamp for cached pages and fragments. Stock is left out on
+    # purpose: orders change it with a plain UPDATE, and pages render it live.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['stock'],
+                condition=models.Q(stock__lte=LOW_STOCK_THRESHOLD),
+                name='product_low_stock_idx'
+            ),
+            # Category pages filter by price range and page by (price, id).
+            models.Index(
+                fields=['category', 'price', 'id'],
+                name='product_category_price_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def stock_status(self):
+        if self.stock == 0:
+            return 'out'
+        if self.stock <= LOW_STOCK_THRESHOLD:
+            return 'low'
+        return 'in'
+
+
+class ProductSearchEntry(models.Model):
+    # The SQLite full-text table from migration 0014 (rowid = product id).
+    # Mapped only so store/search.py can join it into product queries.
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_entry'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'store_product_fts'
+
 
 # ================= USER PROFILE =================
 
@@ -68,6 +113,13 @@ class Order(models.Model):
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='PLACED')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            models.Index(fields=['status'], name='order_status_idx'),
+            models.Index(fields=['payment_status'], name='order_payment_status_idx'),
+        ]
+
     def can_cancel(self):
         return self.status in ['PLACED', 'CONFIRMED']
 
@@ -80,10 +132,41 @@ class Order(models.Model):
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # The product's category when it was sold, so the sales rollup keeps
+    # counting the sale there after the product moves.
+    category = models.ForeignKey(Category, null=True, on_delete=models.SET_NULL, related_name='+')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField()
 
 
+# ================= CART =================
+
+class Cart(models.Model):
+    # Anonymous carts have no user; their id is kept in the session.
+    user = models.OneToOneField(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='cart'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cart of {self.user.username}" if self.user_id else f"Anonymous cart {self.pk}"
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
+
 # ================= NOTIFICATION =================
 
 class Notification(models.Model):
@@ -92,6 +175,18 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+            # is_read=False compiles to "NOT is_read", which can only use an
+            # index whose predicate is that same expression.
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(is_read=False),
+                name='notification_unread_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.message
 
@@ -105,3 +200,56 @@ class EmailVerificationToken(models.Model):
 
     def __str__(self):
         return f"Email verification for {self.user.username}"
+
+
+# ================= DAILY SALES STATS =================
+
+class DailySalesStats(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    payment_method = models.CharField(max_length=10, choices=Order.PAYMENT_METHODS)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'Daily sales stats'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'category', 'payment_method'],
+                name='unique_daily_sales_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} · {self.category} · {self.payment_method}"
+
+
+# ================= OUTGOING EMAIL =================
+
+class OutgoingEmail(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outgoing_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.recipients)}"
@@ -0,0 +1,130 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .metrics import record_cache_lookup
+from .models import Notification
+from .pruning import delete_in_batches
+
+
+# ================= UNREAD NOTIFICATION CACHE =================
+#
+# The navbar needs the unread count (and the latest few messages) on every
+# page, so both live in the cache per user. Every code path that creates,
+# reads or deletes notifications must go through notify_many() or
+# invalidate_notifications() so the cached summary never drifts. That only
+# reaches other workers through a cache they share (see CACHE_BACKEND).
+
+NOTIFICATION_PREVIEW_SIZE = 5
+NOTIFICATION_CACHE_TIMEOUT = 60 * 60
+
+
+def _summary_key(user_id):
+    return f'notifications:summary:{user_id}'
+
+
+def unread_summary(user):
+    key = _summary_key(user.pk)
+    summary = cache.get(key)
+    record_cache_lookup('notifications', summary is not None)
+
+    if summary is None:
+        unread = Notification.objects.filter(
+            user=user,
+            is_read=False
+        ).order_by('-created_at')
+
+        latest = list(
+            unread.values('id', 'message', 'created_at')[:NOTIFICATION_PREVIEW_SIZE]
+        )
+        if len(latest) < NOTIFICATION_PREVIEW_SIZE:
+            unread_count = len(latest)
+        else:
+            unread_count = unread.count()
+
+        summary = {'unread_count': unread_count, 'latest': latest}
+        cache.set(key, summary, NOTIFICATION_CACHE_TIMEOUT)
+
+    return summary
+
+
+def invalidate_notifications(*user_ids):
+    keys = [_summary_key(user_id) for user_id in user_ids]
+    # Defer to commit so a concurrent render can't re-cache the old state
+    # before the change is visible.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+async def ainvalidate_notifications(*user_ids):
+    # The async ORM runs in autocommit, so the change is already visible.
+    await cache.adelete_many([_summary_key(user_id) for user_id in user_ids])
+
+
+# ================= CREATING =================
+#
+# Checkout, cancellations and the admin status actions all create their
+# notifications here: one bulk INSERT per batch and one cache invalidation
+# for every user involved.
+
+NOTIFY_BATCH_SIZE = 1000
+
+
+def notify_many(messages):
+    notifications = Notification.objects.bulk_create([
+        Notification(user_id=user_id, message=message)
+        for user_id, message in messages
+    ], batch_size=NOTIFY_BATCH_SIZE)
+    invalidate_notifications(*{n.user_id for n in notifications})
+    return notifications
+
+
+def notify(user, message):
+    return notify_many([(user.pk, message)])[0]
+
+
+# ================= RETENTION =================
+#
+# Rows older than NOTIFICATION_RETENTION_DAYS go, and so does everything
+# beyond each user's newest NOTIFICATION_MAX_PER_USER. Both go through
+# delete_in_batches(), as session pruning does, and every batch
+# invalidates the summaries of the users it touched.
+
+NOTIFICATION_PRUNE_BATCH_SIZE = 1000
+
+
+def _delete_in_batches(queryset, batch_size, pause):
+    return delete_in_batches(
+        queryset, batch_size, pause,
+        fields=('user_id',),
+        on_batch=lambda rows: invalidate_notifications(*{user_id for _, user_id in rows})
+    )
+
+
+def prune_expired_notifications(batch_size=NOTIFICATION_PRUNE_BATCH_SIZE, pause=0):
+    cutoff = timezone.now() - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    # Old rows have the lowest ids, so walking the primary key finds them first.
+    expired = Notification.objects.filter(created_at__lt=cutoff).order_by('pk')
+    return _delete_in_batches(expired, batch_size, pause)
+
+
+def compact_notifications(batch_size=NOTIFICATION_PRUNE_BATCH_SIZE, pause=0):
+    keep = settings.NOTIFICATION_MAX_PER_USER
+    crowded = (
+        Notification.objects.values('user')
+        .annotate(total=Count('id'))
+        .filter(total__gt=keep)
+        .values_list('user', flat=True)
+    )
+
+    deleted = 0
+    for user_id in list(crowded):
+        overflow = (
+            Notification.objects.filter(user_id=user_id)
+            .order_by('-created_at', '-id')[keep:]
+        )
+        deleted += _delete_in_batches(overflow, batch_size, pause)
+    return deleted
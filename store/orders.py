@@ -0,0 +1,138 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+
+from .catalog import bump_catalog_version
+from .metrics import inc
+from .models import Order, OrderItem, Product
+from .notifications import notify_many
+from .stats import record_order_placed, record_orders_cancelled
+
+
+# ================= ORDER PLACEMENT =================
+
+class OutOfStock(Exception):
+    def __init__(self, product, requested):
+        self.product = product
+        self.requested = requested
+        super().__init__(f"Not enough stock for {product.name}")
+
+
+def place_order(user, cart, address, payment_method):
+    # Lock and decrement in primary-key order so two multi-item orders can
+    # never wait on each other's rows.
+    lines = sorted(cart, key=lambda line: line.product.pk)
+    product_ids = [line.product.pk for line in lines]
+
+    with transaction.atomic():
+        # Row locks are a no-op on SQLite, where the write transaction
+        # already serializes buyers.
+        locked = {
+            pk: (price, category_id)
+            for pk, price, category_id in Product.objects.select_for_update()
+            .filter(pk__in=product_ids)
+            .order_by('pk')
+            .values_list('pk', 'price', 'category_id')
+        }
+        prices = {pk: price for pk, (price, _) in locked.items()}
+
+        for line in lines:
+            updated = Product.objects.filter(
+                pk=line.product.pk,
+                stock__gte=line.quantity
+            ).update(stock=F('stock') - line.quantity)
+
+            if not updated:
+                raise OutOfStock(line.product, line.quantity)
+
+        order = Order.objects.create(
+            user=user,
+            address=address,
+            total_amount=sum(prices[line.product.pk] * line.quantity for line in lines),
+            payment_method=payment_method,
+            payment_status='PAID' if payment_method == 'ONLINE' else 'PENDING',
+            status='PLACED'
+        )
+
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=line.product,
+                category_id=locked[line.product.pk][1],
+                quantity=line.quantity,
+                price=prices[line.product.pk]
+            )
+            for line in lines
+        ])
+
+        record_order_placed(order, items)
+        notify_many([(user.pk, f"✅ Order #{order.id} placed successfully")])
+
+        transaction.on_commit(partial(
+            inc, 'store_orders_placed_total', payment_method=payment_method
+        ))
+
+        # Cached catalog pages show an "Out of Stock" badge, so they only
+        # need invalidating when this order sold something out.
+        sold_out = Product.objects.filter(pk__in=product_ids, stock=0).count()
+        if sold_out:
+            transaction.on_commit(bump_catalog_version)
+            transaction.on_commit(partial(inc, 'store_stock_outs_total', sold_out))
+
+    return order
+
+
+# ================= STATUS TRANSITIONS =================
+#
+# Status changes are applied as one UPDATE per chunk whose WHERE clause only
+# matches orders in an allowed source status, so an order that was already
+# cancelled (or moved on by someone else) is skipped in SQL, not in Python.
+
+ALLOWED_TRANSITIONS = {
+    'CONFIRMED': ('PLACED',),
+    'SHIPPED': ('PLACED', 'CONFIRMED'),
+    'DELIVERED': ('SHIPPED',),
+    'CANCELLED': ('PLACED', 'CONFIRMED'),
+}
+
+TRANSITION_CHUNK_SIZE = 1000
+
+
+def transition_orders(queryset, new_status, message, chunk_size=TRANSITION_CHUNK_SIZE):
+    allowed = ALLOWED_TRANSITIONS[new_status]
+    eligible = queryset.filter(status__in=allowed).order_by('pk')
+
+    changed = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                eligible.filter(pk__gt=last_pk)
+                .select_for_update()
+                .values_list('pk', 'user_id')[:chunk_size]
+            )
+            if not rows:
+                break
+
+            order_ids = [pk for pk, _ in rows]
+            Order.objects.filter(
+                pk__in=order_ids,
+                status__in=allowed
+            ).update(status=new_status)
+
+            if new_status == 'CANCELLED':
+                record_orders_cancelled(order_ids)
+                transaction.on_commit(partial(
+                    inc, 'store_orders_cancelled_total', len(order_ids)
+                ))
+
+            notify_many(
+                (user_id, message.format(id=pk))
+                for pk, user_id in rows
+            )
+
+        changed += len(rows)
+        last_pk = order_ids[-1]
+
+    return changed
@@ -0,0 +1,100 @@
+import hashlib
+import os
+from functools import lru_cache
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.template import Context
+from django.template.loader import get_template
+from django.template.loader_tags import ExtendsNode
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .metrics import record_cache_lookup
+from .notifications import unread_summary
+
+
+# ================= STATIC PAGE CACHE =================
+#
+# The policy and contact pages only change when their templates do. The
+# version of a page is the newest mtime of its template and the templates
+# it extends; that version and the navbar state (anonymous, or which user
+# with how many unread notifications) make up its ETag. A conditional
+# request that matches is answered 304 without rendering. Anonymous
+# visitors, crawlers included, share one cached body per version, so
+# repeat hits render nothing and run no queries.
+#
+# A request with flash messages waiting is always rendered, so the
+# messages are shown and consumed as usual.
+
+STATIC_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+STATIC_PAGE_MAX_AGE = 60 * 10
+
+
+@lru_cache(maxsize=None)
+def _template_files(template_name):
+    files = []
+    template = get_template(template_name).template
+    while template is not None:
+        files.append(template.origin.name)
+        extends = template.nodelist.get_nodes_by_type(ExtendsNode)
+        template = get_template(extends[0].parent_name.resolve(Context())).template if extends else None
+    return tuple(files)
+
+
+def template_mtime(template_name):
+    return int(max(os.stat(path).st_mtime for path in _template_files(template_name)))
+
+
+def navbar_state(request):
+    if not request.user.is_authenticated:
+        return 'anonymous'
+    return f'user:{request.user.pk}:{unread_summary(request.user)["unread_count"]}'
+
+
+def page_etag(*parts):
+    return '"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def not_modified(request, etag, last_modified=None):
+    # A 304 would leave waiting flash messages unshown.
+    if get_messages(request):
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def render_static_page(request, template_name):
+    if get_messages(request):
+        return render(request, template_name)
+
+    last_modified = template_mtime(template_name)
+    anonymous = not request.user.is_authenticated
+    etag = page_etag(template_name, last_modified, navbar_state(request))
+
+    # Signed-in pages also vary with the navbar, which the template mtime
+    # knows nothing about; for them Last-Modified is informational only.
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified if anonymous else None
+    )
+    if response is None and anonymous:
+        key = 'pages:%s:%s' % (template_name, last_modified)
+        content = cache.get(key)
+        record_cache_lookup('static_pages', content is not None)
+        if content is None:
+            content = render(request, template_name).content
+            cache.set(key, content, STATIC_PAGE_CACHE_TIMEOUT)
+        response = HttpResponse(content)
+    elif response is None:
+        response = render(request, template_name)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if anonymous:
+        patch_cache_control(response, public=True, max_age=STATIC_PAGE_MAX_AGE)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
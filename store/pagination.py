@@ -0,0 +1,165 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Q
+
+
+# ================= KEYSET (CURSOR) PAGINATION =================
+#
+# Pages are addressed by the ordering values of the last row shown instead
+# of an OFFSET, so fetching page 500 costs the same index seek as page 1.
+# The ordering must end in a unique field (normally the primary key) so
+# that every row has exactly one position.
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _resolve_fields(model, ordering):
+    fields = []
+    for name in ordering:
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        fields.append((name, field, descending))
+    return fields
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def encode_cursor(row, ordering, model):
+    values = []
+    for name, field, _ in _resolve_fields(model, ordering):
+        if isinstance(row, dict):
+            values.append(row[name])
+        else:
+            values.append(getattr(row, field.attname))
+    raw = json.dumps(values, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+TEXT_ENCODED_FIELDS = (models.DateField, models.DecimalField)
+
+
+def decode_cursor(cursor, ordering, model):
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+    fields = _resolve_fields(model, ordering)
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+
+    decoded = []
+    for (_, field, _), value in zip(fields, values):
+        # None can't be compared in SQL, and to_python() only expects text
+        # for these fields (encode_cursor never writes anything else).
+        if value is None or isinstance(value, (list, dict)):
+            return None
+        if isinstance(field, TEXT_ENCODED_FIELDS) and not isinstance(value, str):
+            return None
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except (ValidationError, TypeError, ValueError):
+            return None
+        decoded.append(value)
+    return decoded
+
+
+def normalize_cursor(cursor, ordering, model):
+    # One spelling per position, for cache keys; junk becomes no cursor.
+    values = decode_cursor(cursor, ordering, model)
+    if values is None:
+        return None
+    names = [name for name, _, _ in _resolve_fields(model, ordering)]
+    return encode_cursor(dict(zip(names, values)), ordering, model)
+
+
+def _after(fields, values):
+    condition = Q()
+    equal_so_far = Q()
+    for (name, _, descending), value in zip(fields, values):
+        lookup = f"{name}__lt" if descending else f"{name}__gt"
+        condition |= equal_so_far & Q(**{lookup: value})
+        equal_so_far &= Q(**{name: value})
+    return condition
+
+
+def _keyset_window(queryset, ordering, cursor, per_page):
+    model = queryset.model
+    queryset = queryset.order_by(*ordering)
+
+    values = decode_cursor(cursor, ordering, model)
+    if values is not None:
+        queryset = queryset.filter(_after(_resolve_fields(model, ordering), values))
+
+    return queryset[:per_page + 1]
+
+
+def _keyset_page(rows, ordering, model, per_page):
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1], ordering, model)
+
+    return KeysetPage(rows, next_cursor)
+
+
+def paginate_keyset(queryset, ordering, cursor=None, per_page=24):
+    rows = list(_keyset_window(queryset, ordering, cursor, per_page))
+    return _keyset_page(rows, ordering, queryset.model, per_page)
+
+
+async def apaginate_keyset(queryset, ordering, cursor=None, per_page=24):
+    rows = [row async for row in _keyset_window(queryset, ordering, cursor, per_page)]
+    return _keyset_page(rows, ordering, queryset.model, per_page)
+
+
+# ================= RANKED RESULT WINDOWS =================
+#
+# Relevance-ranked results (search) have no stable column to continue
+# from, so they are paged by offset instead. The window is capped, which
+# keeps the deepest OFFSET bounded.
+
+def paginate_window(queryset, cursor=None, per_page=24, max_rows=480):
+    try:
+        offset = max(0, int(cursor or 0))
+    except ValueError:
+        offset = 0
+    if offset >= max_rows:
+        return KeysetPage([], None)
+
+    rows = list(queryset[offset:min(offset + per_page, max_rows) + 1])
+    next_cursor = None
+    if len(rows) > per_page and offset + per_page < max_rows:
+        next_cursor = str(offset + per_page)
+    return KeysetPage(rows[:per_page], next_cursor)
@@ -0,0 +1,85 @@
+# ================= MINIMAL PDF WRITER =================
+#
+# Just enough PDF to print a plain-text document (invoices) in a built-in
+# monospaced font, so we don't need a PDF library in requirements.txt.
+# Text is limited to the WinAnsi character set; anything else is replaced.
+
+PAGE_WIDTH = 595   # A4 in points
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 10
+LINE_HEIGHT = 14
+
+_REPLACEMENTS = {
+    '₹': 'Rs.',
+    '–': '-',
+    '—': '-',
+    '’': "'",
+    '‘': "'",
+    '“': '"',
+    '”': '"',
+}
+
+
+def _escape(text):
+    for char, replacement in _REPLACEMENTS.items():
+        text = text.replace(char, replacement)
+    text = text.encode('cp1252', errors='replace').decode('cp1252')
+    return (
+        text.replace('\\', '\\\\')
+        .replace('(', '\\(')
+        .replace(')', '\\)')
+    )
+
+
+def _page_stream(lines):
+    top = PAGE_HEIGHT - MARGIN
+    parts = [f"BT /F1 {FONT_SIZE} Tf {LINE_HEIGHT} TL {MARGIN} {top} Td"]
+    for line in lines:
+        parts.append(f"({_escape(line)}) Tj T*")
+    parts.append("ET")
+    return '\n'.join(parts).encode('cp1252')
+
+
+def render_text_pdf(lines, title=''):
+    per_page = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+    pages = [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+
+    # Object numbers: 1 catalog, 2 page tree, 3 font, 4 info, then a
+    # (page, content stream) pair per page.
+    objects = {}
+    kids = []
+    for index, page_lines in enumerate(pages):
+        page_id = 5 + 2 * index
+        stream = _page_stream(page_lines)
+        kids.append(f"{page_id} 0 R")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode()
+        objects[page_id + 1] = (
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+    objects[3] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>"
+    objects[4] = f"<< /Title ({_escape(title)}) /Producer (Smart Shop) >>".encode('cp1252')
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(output)
+        output += f"{number} 0 obj\n".encode() + objects[number] + b"\nendobj\n"
+
+    xref_offset = len(output)
+    size = max(objects) + 1
+    output += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for number in range(1, size):
+        output += f"{offsets[number]:010d} 00000 n \n".encode()
+    output += (
+        f"trailer\n<< /Size {size} /Root 1 0 R /Info 4 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode()
+
+    return bytes(output)
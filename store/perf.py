@@ -0,0 +1,166 @@
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+
+
+# ================= REQUEST PERFORMANCE SAMPLES =================
+#
+# PerformanceMiddleware records one sample per sampled request into a
+# fixed-size deque. deque.append with maxlen is atomic under the GIL, so
+# request threads never take a lock; the admin page copies the deque and
+# aggregates the copy.
+
+PERF_BUFFER_SIZE = 1000
+PERF_DUPLICATE_THRESHOLD = 3
+
+samples = deque(maxlen=PERF_BUFFER_SIZE)
+
+_current = ContextVar('store_perf_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        return [
+            (sql, count)
+            for sql, count in self.statements.most_common(5)
+            if count >= PERF_DUPLICATE_THRESHOLD
+        ]
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record(request, response, stats, wall_time):
+    match = getattr(request, 'resolver_match', None)
+    samples.append({
+        'view': match.view_name if match else request.path,
+        'method': request.method,
+        'status': response.status_code,
+        'wall_ms': wall_time * 1000,
+        'queries': stats.queries,
+        'db_ms': stats.db_time * 1000,
+        'template_ms': stats.template_time * 1000,
+        'duplicates': stats.duplicates(),
+        'at': time.time(),
+    })
+
+
+# ================= QUERY TIMING =================
+#
+# Async views run their queries in sync_to_async threads, each with its
+# own connection, where a wrapper set up around the view would never see
+# them. Every connection carries one wrapper instead, which charges the
+# request whose stats are in the current context (sync_to_async carries
+# the context into its thread).
+
+def _time_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def _add_query_timer(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def install_query_timer():
+    connection_created.connect(_add_query_timer, dispatch_uid='store_perf_query_timer')
+    for connection in connections.all(initialized_only=True):
+        _add_query_timer(connection)
+
+
+# ================= TEMPLATE TIMING =================
+
+def install_template_timer():
+    original = DjangoTemplate.render
+    if getattr(original, 'store_perf_timer', False):
+        return
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        # Only time the outermost render; includes are part of it.
+        if stats is None or stats.rendering:
+            return original(self, context, request)
+
+        stats.rendering = True
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+            stats.rendering = False
+
+    render.store_perf_timer = True
+    DjangoTemplate.render = render
+
+
+# ================= SUMMARY =================
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize():
+    snapshot = tuple(samples)
+
+    by_view = defaultdict(list)
+    for sample in snapshot:
+        by_view[sample['view']].append(sample)
+
+    views = []
+    for view, rows in by_view.items():
+        wall = [row['wall_ms'] for row in rows]
+        views.append({
+            'view': view,
+            'requests': len(rows),
+            'p50_ms': _percentile(wall, 0.50),
+            'p95_ms': _percentile(wall, 0.95),
+            'avg_queries': sum(row['queries'] for row in rows) / len(rows),
+            'max_queries': max(row['queries'] for row in rows),
+            'avg_db_ms': sum(row['db_ms'] for row in rows) / len(rows),
+            'avg_template_ms': sum(row['template_ms'] for row in rows) / len(rows),
+            'duplicate_requests': sum(1 for row in rows if row['duplicates']),
+        })
+    views.sort(key=lambda row: row['p95_ms'], reverse=True)
+
+    suspects = sorted(
+        (sample for sample in snapshot if sample['duplicates']),
+        key=lambda sample: sample['queries'],
+        reverse=True
+    )[:20]
+
+    return {
+        'sample_count': len(snapshot),
+        'views': views,
+        'slowest': sorted(snapshot, key=lambda sample: sample['wall_ms'], reverse=True)[:20],
+        'duplicate_suspects': suspects,
+    }
@@ -0,0 +1,26 @@
+import time
+
+from django.db import transaction
+
+
+# ================= BATCHED DELETES =================
+#
+# Retention jobs delete in small transactions, one batch at a time, so
+# SQLite's write lock is never held for long and requests can write in
+# between. Each row is read as its pk followed by `fields`, and
+# `on_batch` receives those rows inside the batch's transaction (the
+# notification summary is invalidated from there).
+
+def delete_in_batches(queryset, batch_size, pause=0, fields=(), on_batch=None):
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.values_list('pk', *fields)[:batch_size])
+            if not rows:
+                return deleted
+            queryset.model.objects.filter(pk__in=[row[0] for row in rows]).delete()
+            if on_batch:
+                on_batch(rows)
+        deleted += len(rows)
+        if pause:
+            time.sleep(pause)
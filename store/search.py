@@ -0,0 +1,128 @@
+import re
+from functools import reduce
+from operator import and_
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+
+# ================= PRODUCT SEARCH =================
+#
+# Product name and description are full-text indexed by the database
+# itself, so search needs no outside service:
+#
+#   SQLite      an FTS5 table (store_product_fts) whose rowid is the
+#               product id, written by the signals in signals.py
+#   PostgreSQL  a GIN expression index over the same SearchVector the
+#               queries use, so the database keeps it current
+#
+# Every term is matched as a prefix ("blu sho" finds "Blue Shoes") and the
+# results are ranked with name matches above description matches. Other
+# databases fall back to icontains.
+
+FTS_TABLE = 'store_product_fts'
+SEARCH_CONFIG = 'english'
+SEARCH_MAX_TERMS = 8
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def search_terms(query):
+    return re.findall(r'\w+', (query or '').lower())[:SEARCH_MAX_TERMS]
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+# ================= INDEX MAINTENANCE =================
+
+def index_products(products):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+            [(product.pk, product.name, product.description) for product in products]
+        )
+
+
+def unindex_products(product_ids):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in product_ids]
+        )
+
+
+def rebuild_search_index():
+    if connection.vendor != 'sqlite':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+            'SELECT id, name, description FROM store_product'
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+# ================= QUERIES =================
+
+def _sqlite_search(queryset, terms, ranked):
+    match = ' '.join(f'"{term}"*' for term in terms)
+    # MATCH and bm25() only work on the FTS table itself, so it is joined in
+    # (through ProductSearchEntry) rather than queried as a subquery.
+    queryset = queryset.filter(search_entry__isnull=False).filter(
+        RawSQL(f'{FTS_TABLE} MATCH %s', [match], output_field=BooleanField())
+    )
+    if not ranked:
+        return queryset
+    # bm25() is lower for better matches, so ascending order is best-first.
+    return queryset.annotate(search_rank=RawSQL(
+        f'bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT})',
+        [],
+        output_field=FloatField()
+    )).order_by('search_rank', 'pk')
+
+
+def _postgres_search(queryset, terms, ranked):
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+
+    query = SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms),
+        search_type='raw',
+        config=SEARCH_CONFIG
+    )
+    queryset = queryset.annotate(search_document=search_vector()).filter(search_document=query)
+    if not ranked:
+        return queryset
+    return queryset.annotate(
+        search_rank=-SearchRank(search_vector(), query)
+    ).order_by('search_rank', 'pk')
+
+
+def search_products(queryset, query, ranked=True):
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(queryset, terms, ranked)
+    if connection.vendor == 'postgresql':
+        return _postgres_search(queryset, terms, ranked)
+
+    return queryset.filter(reduce(and_, (
+        Q(name__icontains=term) | Q(description__icontains=term)
+        for term in terms
+    )))
@@ -0,0 +1,290 @@
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from .autocomplete import bump_index_version
+from .catalog import bump_catalog_version
+from .models import Category, Notification, Order, OrderItem, Product, UserProfile
+from .search import rebuild_search_index
+from .stats import rebuild_sales_stats
+
+
+# ================= BULK DATASET GENERATOR =================
+#
+# Fills the store with realistic-looking data for benchmarks and load tests
+# (see the seed_store command). Rows are written with bulk_create in
+# batches, so no model signals fire: the sales rollup and catalog version
+# are brought up to date once at the end instead. The same seed always
+# produces the same rows.
+
+FULL_SIZES = {
+    'categories': 50,
+    'products': 100_000,
+    'users': 2_000,
+    'orders': 1_000_000,
+    'items_per_order': 3,
+    'notifications': 200_000,
+}
+
+SEED_BATCH_SIZE = 5000
+SEED_HISTORY_DAYS = 365
+SEED_USERNAME_PREFIX = 'shopper'
+SEED_PASSWORD = 'shopper123'
+PLACEHOLDER_IMAGE_SIZE = 600
+
+ORDER_STATUS_WEIGHTS = {
+    'PLACED': 10,
+    'CONFIRMED': 10,
+    'SHIPPED': 15,
+    'DELIVERED': 55,
+    'CANCELLED': 10,
+}
+
+CATEGORY_NAMES = (
+    'Electronics', 'Books', 'Fashion', 'Home', 'Kitchen', 'Sports', 'Toys',
+    'Beauty', 'Grocery', 'Garden', 'Music', 'Stationery', 'Automotive', 'Health',
+)
+
+
+def scaled_sizes(scale, **overrides):
+    sizes = {
+        key: value if key in ('categories', 'items_per_order') else max(1, int(value * scale))
+        for key, value in FULL_SIZES.items()
+    }
+    sizes.update((key, value) for key, value in overrides.items() if value is not None)
+    return sizes
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    # bulk_create honours auto_now_add, which would stamp every seeded row
+    # with the same instant; switch it off so history can be spread out.
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _placeholder_image(name, color):
+    path = f'products/placeholders/{name}.jpg'
+    if not default_storage.exists(path):
+        image = Image.new('RGB', (PLACEHOLDER_IMAGE_SIZE, PLACEHOLDER_IMAGE_SIZE), color)
+        draw = ImageDraw.Draw(image)
+        edge = PLACEHOLDER_IMAGE_SIZE - 40
+        draw.rectangle((40, 40, edge, edge), outline='white', width=8)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=80)
+        path = default_storage.save(path, ContentFile(buffer.getvalue()))
+    return path
+
+
+def _history_end():
+    # Anchored to midnight so reruns with the same seed on the same day
+    # produce identical rows.
+    return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _past(rng, now, days):
+    return now - timedelta(seconds=rng.random() * days * 86400)
+
+
+def seed_categories(rng, sizes, images=True):
+    categories = []
+    for i in range(sizes['categories']):
+        base = CATEGORY_NAMES[i % len(CATEGORY_NAMES)]
+        suffix = f' {i // len(CATEGORY_NAMES) + 1}' if i >= len(CATEGORY_NAMES) else ''
+        categories.append(Category(
+            name=f'{base}{suffix}',
+            slug=f'{base.lower()}{suffix.replace(" ", "-")}'
+        ))
+    categories = Category.objects.bulk_create(categories)
+
+    # One placeholder per category is shared by all of its products.
+    images_by_category = {}
+    for category in categories:
+        if images:
+            color = tuple(rng.randrange(40, 200) for _ in range(3))
+            images_by_category[category.pk] = _placeholder_image(category.slug, color)
+        else:
+            images_by_category[category.pk] = 'products/placeholder.jpg'
+    return categories, images_by_category
+
+
+def seed_products(rng, sizes, categories, images_by_category, batch_size):
+    def rows():
+        for i in range(sizes['products']):
+            category = categories[rng.randrange(len(categories))]
+            yield Product(
+                category=category,
+                name=f'{category.name} item {i + 1}',
+                description=f'{category.name} item {i + 1}. Generated for load testing.',
+                price=Decimal(rng.randrange(9900, 999900)) / 100,
+                stock=rng.choice((0, 2, 5)) if rng.random() < 0.05 else rng.randrange(6, 500),
+                image=images_by_category[category.pk]
+            )
+
+    for batch in _batches(rows(), batch_size):
+        Product.objects.bulk_create(batch)
+
+    return list(Product.objects.order_by('pk').values_list('pk', 'price', 'category_id'))
+
+
+def seed_users(rng, sizes, batch_size, password=SEED_PASSWORD):
+    # Hashing once and sharing the hash keeps this fast; every seeded
+    # account logs in with the same password.
+    hashed = make_password(password)
+    now = _history_end()
+
+    def rows():
+        for i in range(sizes['users']):
+            yield User(
+                username=f'{SEED_USERNAME_PREFIX}{i}',
+                email=f'{SEED_USERNAME_PREFIX}{i}@example.com',
+                password=hashed,
+                date_joined=_past(rng, now, SEED_HISTORY_DAYS)
+            )
+
+    for batch in _batches(rows(), batch_size):
+        User.objects.bulk_create(batch)
+
+    user_ids = list(
+        User.objects.filter(username__startswith=SEED_USERNAME_PREFIX)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+    profiles = (
+        UserProfile(
+            user_id=user_id,
+            phone=f'9{rng.randrange(10**9):09d}',
+            address=f'{rng.randrange(1, 999)} Market Road'
+        )
+        for user_id in user_ids
+    )
+    for batch in _batches(profiles, batch_size):
+        UserProfile.objects.bulk_create(batch)
+    return user_ids
+
+
+def _pick_user(rng, user_ids):
+    # Squaring skews activity towards the first users, so a few accounts
+    # have long order histories the way real regulars do.
+    return user_ids[int(len(user_ids) * rng.random() ** 2)]
+
+
+def seed_orders(rng, sizes, user_ids, products, batch_size):
+    now = _history_end()
+    statuses = list(ORDER_STATUS_WEIGHTS)
+    weights = list(ORDER_STATUS_WEIGHTS.values())
+    max_items = max(1, 2 * sizes['items_per_order'] - 1)
+
+    created = 0
+    with explicit_timestamps(Order._meta.get_field('created_at')):
+        while created < sizes['orders']:
+            count = min(batch_size, sizes['orders'] - created)
+            orders, lines = [], []
+            for _ in range(count):
+                picked = [
+                    products[rng.randrange(len(products))]
+                    for _ in range(rng.randint(1, max_items))
+                ]
+                quantities = [rng.choice((1, 1, 1, 2, 3)) for _ in picked]
+                method = rng.choice(('COD', 'ONLINE'))
+                orders.append(Order(
+                    user_id=_pick_user(rng, user_ids),
+                    address=f'{rng.randrange(1, 999)} Market Road',
+                    total_amount=sum(price * qty for (_, price, _), qty in zip(picked, quantities)),
+                    payment_method=method,
+                    payment_status='PAID' if method == 'ONLINE' else 'PENDING',
+                    status=rng.choices(statuses, weights)[0],
+                    created_at=_past(rng, now, SEED_HISTORY_DAYS)
+                ))
+                lines.append(list(zip(picked, quantities)))
+
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order_id=order.pk,
+                        product_id=product_id,
+                        category_id=category_id,
+                        price=price,
+                        quantity=qty
+                    )
+                    for order, order_lines in zip(orders, lines)
+                    for (product_id, price, category_id), qty in order_lines
+                ], batch_size=batch_size)
+            created += count
+    return created
+
+
+def seed_notifications(rng, sizes, user_ids, batch_size):
+    now = _history_end()
+
+    def rows():
+        for _ in range(sizes['notifications']):
+            yield Notification(
+                user_id=_pick_user(rng, user_ids),
+                message=f'📦 Order #{rng.randrange(1, max(2, sizes["orders"]))} shipped',
+                is_read=rng.random() < 0.8,
+                created_at=_past(rng, now, SEED_HISTORY_DAYS)
+            )
+
+    with explicit_timestamps(Notification._meta.get_field('created_at')):
+        for batch in _batches(rows(), batch_size):
+            Notification.objects.bulk_create(batch)
+
+
+def seed_store(sizes, seed=0, batch_size=SEED_BATCH_SIZE, images=True, log=None):
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+
+    categories, images_by_category = seed_categories(rng, sizes, images=images)
+    log(f"{len(categories)} categories")
+
+    products = seed_products(rng, sizes, categories, images_by_category, batch_size)
+    log(f"{len(products)} products")
+
+    user_ids = seed_users(rng, sizes, batch_size)
+    log(f"{len(user_ids)} users")
+
+    orders = seed_orders(rng, sizes, user_ids, products, batch_size)
+    log(f"{orders} orders")
+
+    seed_notifications(rng, sizes, user_ids, batch_size)
+    log(f"{sizes['notifications']} notifications")
+
+    # bulk_create skipped the signals that normally keep these current.
+    rebuild_sales_stats()
+    rebuild_search_index()
+    bump_catalog_version()
+    bump_index_version()
+
+    return {
+        'categories': [category.pk for category in categories],
+        'products': [pk for pk, _, _ in products],
+        'users': user_ids,
+    }
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .models import Cart
+from .pruning import delete_in_batches
+
+
+# ================= SESSION ENGINE =================
+#
+# SESSION_STORE=cached_db (with CACHE_BACKEND=file). Django's cached_db
+# engine serves reads from the cache and writes every save through to
+# django_session. Views mark the session modified whenever they assign to
+# it, even when the value is the same as before, and each of those would
+# rewrite the row. This store remembers what it loaded and drops saves
+# that would write it back unchanged. New sessions, key rotation on login
+# and explicit expiry changes (kept inside the data) still save as usual.
+
+class SessionStore(CachedDBStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._stored_state = None
+
+    def _state(self, data):
+        return self.serializer().dumps(data)
+
+    def _unchanged(self, must_create):
+        return (
+            not must_create
+            and self.session_key is not None
+            and self._stored_state is not None
+            and self._state(self._session) == self._stored_state
+        )
+
+    def load(self):
+        data = super().load()
+        self._stored_state = self._state(data)
+        return data
+
+    async def aload(self):
+        data = await super().aload()
+        self._stored_state = self._state(data)
+        return data
+
+    def save(self, must_create=False):
+        if self._unchanged(must_create):
+            return
+        super().save(must_create)
+        self._stored_state = self._state(self._session)
+
+    async def asave(self, must_create=False):
+        if self._unchanged(must_create):
+            return
+        await super().asave(must_create)
+        self._stored_state = self._state(self._session)
+
+
+# ================= PRUNING =================
+#
+# Django's clearsessions deletes every expired row in one statement, which
+# holds SQLite's write lock for as long as that takes. Pruning goes
+# through delete_in_batches() instead, so requests can write in between.
+
+SESSION_PRUNE_BATCH_SIZE = 1000
+
+
+def prune_expired_sessions(batch_size=SESSION_PRUNE_BATCH_SIZE, pause=0):
+    expired = Session.objects.filter(expire_date__lt=timezone.now())
+    return delete_in_batches(expired, batch_size, pause)
+
+
+def prune_anonymous_carts(batch_size=SESSION_PRUNE_BATCH_SIZE, pause=0):
+    # An anonymous cart is only reachable through the session that created
+    # it, so it is kept as long as a fresh session would be.
+    cutoff = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    abandoned = Cart.objects.filter(user=None, created_at__lt=cutoff).order_by('pk')
+    return delete_in_batches(abandoned, batch_size, pause)
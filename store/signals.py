@@ -0,0 +1,86 @@
+from functools import partial
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete
+from .cart import merge_anonymous_cart
+from .catalog import bump_catalog_version
+from .images import generate_variants
+from .models import Category, Order, Product
+from .search import index_products, unindex_products
+from .stats import record_orders_cancelled, record_orders_restored
+
+
+# ================= CATALOG CACHE =================
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+# ================= PRODUCT IMAGES =================
+
+@receiver(post_save, sender=Product)
+def build_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generate_variants(instance)
+
+
+# ================= SEARCH INDEX =================
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    index_products([instance])
+    # The in-memory index has no rollback, so it only hears about commits.
+    transaction.on_commit(partial(autocomplete.product_saved, instance.pk, instance.name))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    unindex_products([instance.pk])
+    transaction.on_commit(partial(autocomplete.product_deleted, instance.pk))
+
+
+# ================= CART =================
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        merge_anonymous_cart(request, user)
+
+
+# ================= SALES ROLLUP =================
+#
+# place_order() and transition_orders() keep DailySalesStats in step
+# themselves (the latter with UPDATEs, which send no signals). These catch
+# everything else: status edits through save() and deleted orders.
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, raw=False, **kwargs):
+    instance._stored_status = None
+    if not raw and not instance._state.adding:
+        instance._stored_status = (
+            Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def follow_order_status(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_stored_status', None)
+    if raw or created or previous is None or previous == instance.status:
+        return
+    if instance.status == 'CANCELLED':
+        record_orders_cancelled([instance.pk])
+    elif previous == 'CANCELLED':
+        record_orders_restored([instance.pk])
+
+
+@receiver(pre_delete, sender=Order)
+def drop_deleted_order(sender, instance, **kwargs):
+    # Its items are still there until the cascade runs.
+    if instance.status != 'CANCELLED':
+        record_orders_cancelled([instance.pk])
@@ -0,0 +1,203 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import DailySalesStats, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+def rollup_enabled():
+    return getattr(settings, 'SALES_ROLLUP_ENABLED', True)
+
+
+# ================= ORDER OVERVIEW =================
+
+def order_overview():
+    status_counts = {
+        status: Count('id', filter=Q(status=status))
+        for status, _ in Order.STATUS_CHOICES
+    }
+
+    result = Order.objects.aggregate(
+        total_orders=Count('id'),
+        total_revenue=Sum('total_amount', filter=Q(payment_status='PAID')),
+        **status_counts
+    )
+
+    return {
+        'total_orders': result['total_orders'],
+        'total_revenue': result['total_revenue'] or 0,
+        'order_status_count': {status: result[status] for status in status_counts},
+    }
+
+
+# ================= DAILY SALES ROLLUP =================
+#
+# DailySalesStats holds one row per (day, category, payment method) with
+# the units and revenue of every non-cancelled order placed that day. Rows
+# are adjusted in place as orders are placed or cancelled, and can be
+# rebuilt from scratch with the rebuild_sales_stats command. Status edits
+# and deletes outside place_order() and transition_orders() are caught by
+# the receivers in signals.py. A bucket left without orders is deleted, as
+# a rebuild would never create it.
+#
+# Items are bucketed under the category stored on the OrderItem when it was
+# sold, not the product's current one, so moving a product later leaves
+# its past sales (and their cancellation) where they were.
+
+def _apply_deltas(buckets, sign):
+    for (day, category_id, payment_method), (orders, units, revenue) in buckets.items():
+        bucket = DailySalesStats.objects.filter(
+            date=day,
+            category_id=category_id,
+            payment_method=payment_method
+        )
+        changes = {
+            'orders': F('orders') + sign * orders,
+            'units': F('units') + sign * units,
+            'revenue': F('revenue') + sign * revenue,
+        }
+
+        if sign < 0:
+            # Clamped: a bucket that has drifted must not fail the UPDATE.
+            bucket.update(**{
+                field: Greatest(change, 0)
+                for field, change in changes.items()
+            })
+            bucket.filter(orders__lte=0).delete()
+            continue
+        if bucket.update(**changes):
+            continue
+
+        try:
+            with transaction.atomic():
+                DailySalesStats.objects.create(
+                    date=day,
+                    category_id=category_id,
+                    payment_method=payment_method,
+                    orders=orders,
+                    units=units,
+                    revenue=revenue
+                )
+        except IntegrityError:
+            bucket.update(**changes)
+
+
+def _grouped_items(items):
+    return (
+        items.filter(category__isnull=False)
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', 'category', 'order__payment_method')
+        .annotate(
+            order_count=Count('order', distinct=True),
+            unit_count=Sum('quantity'),
+            revenue_total=Sum(
+                F('price') * F('quantity'),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            ),
+        )
+        .order_by()
+    )
+
+
+def record_order_placed(order, items):
+    if not rollup_enabled():
+        return
+
+    day = timezone.localdate(order.created_at)
+    buckets = defaultdict(lambda: [1, 0, Decimal('0')])
+    for item in items:
+        if item.category_id is None:
+            continue
+        bucket = buckets[(day, item.category_id, order.payment_method)]
+        bucket[1] += item.quantity
+        bucket[2] += item.price * item.quantity
+
+    _apply_deltas(buckets, 1)
+
+
+def _record_orders(order_ids, sign):
+    if not rollup_enabled():
+        return
+
+    rows = _grouped_items(OrderItem.objects.filter(order_id__in=order_ids))
+    try:
+        # A savepoint, so the status change around it still commits.
+        with transaction.atomic():
+            _apply_deltas({
+                (row['day'], row['category'], row['order__payment_method']):
+                    (row['order_count'], row['unit_count'], row['revenue_total'])
+                for row in rows
+            }, sign)
+    except DatabaseError:
+        logger.exception(
+            "Sales rollup not adjusted for orders %s; run rebuild_sales_stats.",
+            order_ids
+        )
+
+
+def record_orders_cancelled(order_ids):
+    # Also used for non-cancelled orders that are deleted.
+    _record_orders(order_ids, -1)
+
+
+def record_orders_restored(order_ids):
+    _record_orders(order_ids, 1)
+
+
+def rebuild_sales_stats(since=None):
+    items = OrderItem.objects.exclude(order__status='CANCELLED')
+    stale = DailySalesStats.objects.all()
+    if since is not None:
+        items = items.filter(order__created_at__date__gte=since)
+        stale = stale.filter(date__gte=since)
+
+    rows = _grouped_items(items)
+
+    with transaction.atomic():
+        stale.delete()
+        created = DailySalesStats.objects.bulk_create([
+            DailySalesStats(
+                date=row['day'],
+                category_id=row['category'],
+                payment_method=row['order__payment_method'],
+                orders=row['order_count'],
+                units=row['unit_count'],
+                revenue=row['revenue_total']
+            )
+            for row in rows
+        ], batch_size=1000)
+
+    return len(created)
+
+
+def sales_breakdown(days=30):
+    since = timezone.localdate() - timedelta(days=days - 1)
+
+    by_day = defaultdict(Decimal)
+    by_category = defaultdict(Decimal)
+    by_method = defaultdict(Decimal)
+
+    rows = DailySalesStats.objects.filter(date__gte=since).select_related('category')
+    for row in rows:
+        by_day[row.date] += row.revenue
+        by_category[row.category.name] += row.revenue
+        by_method[row.get_payment_method_display()] += row.revenue
+
+    def ranked(totals):
+        return sorted(totals.items(), key=lambda pair: pair[1], reverse=True)
+
+    return {
+        'days': days,
+        'revenue_by_day': sorted(by_day.items()),
+        'revenue_by_category': ranked(by_category),
+        'revenue_by_payment_method': ranked(by_method),
+    }
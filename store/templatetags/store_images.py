@@ -0,0 +1,34 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from store.images import has_variants, variant_name, variant_srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_picture(product, variant='thumb', sizes='100vw', css_class='', style='', loading='lazy'):
+    image = product.image
+    if not image:
+        return ''
+
+    # Products saved before the variant pipeline existed (and not yet
+    # backfilled) fall back to the original upload.
+    if not has_variants(image.name):
+        return format_html(
+            '<img src="{}" class="{}" style="{}" alt="{}" loading="{}">',
+            image.url, css_class, style, product.name, loading
+        )
+
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" style="{}" alt="{}" '
+        'loading="{}" decoding="async">'
+        '</picture>',
+        variant_srcset(image.name, 'webp'), sizes,
+        default_storage.url(variant_name(image.name, variant, 'jpg')),
+        variant_srcset(image.name, 'jpg'), sizes,
+        css_class, style, product.name, loading
+    )
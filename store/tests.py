@@ -1,3 +1,2094 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from smtplib import SMTPException
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import Q
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import async_views, autocomplete, live, metrics, perf, views
+from . import urls as store_urls
+from .cart import LEGACY_SESSION_KEY, resolve_cart
+from .catalog import (
+    CATALOG_ORDERING,
+    CATALOG_PAGE_SIZE,
+    CATEGORY_PAGE_SIZE,
+    bump_catalog_version,
+    get_catalog_page,
+    get_price_histogram,
+)
+from .images import IMAGE_FORMATS, IMAGE_VARIANTS, variant_name
+from .mail import enqueue_mail, send_queued_mail
+from .models import (
+    Cart,
+    CartItem,
+    Category,
+    DailySalesStats,
+    EmailVerificationToken,
+    Notification,
+    Order,
+    OrderItem,
+    OutgoingEmail,
+    Product,
+)
+from .notifications import notify, notify_many, unread_summary
+from .orders import ALLOWED_TRANSITIONS, OutOfStock, place_order, transition_orders
+from .pagination import decode_cursor, encode_cursor
+from .search import search_products
+from .seeding import SEED_USERNAME_PREFIX, scaled_sizes, seed_store
+from .sessions import SessionStore
+from .stats import order_overview, rebuild_sales_stats, sales_breakdown
+
+
+def make_product(category=None, **kwargs):
+    if category is None:
+        category, _ = Category.objects.get_or_create(name='General', slug='general')
+    defaults = {
+        'name': 'Product',
+        'description': 'Description',
+        'price': '100.00',
+        'stock': 10,
+        'image': 'products/placeholder.jpg',
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(category=category, **defaults)
+
+
+# ================= CART =================
+
+class CartStorageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer')
+        self.product = make_product(stock=3)
+
+    def quantities(self, user=None):
+        return dict(
+            CartItem.objects.filter(cart__user=user or self.user)
+            .values_list('product_id', 'quantity')
+        )
+
+    def test_clicks_increment_the_line_up_to_stock(self):
+        self.client.force_login(self.user)
+        url = reverse('store:add_to_cart', args=[self.product.pk])
+
+        for _ in range(4):
+            self.client.get(url)
+
+        self.assertEqual(self.quantities(), {self.product.pk: 3})
+
+        self.client.get(reverse('store:update_cart', args=[self.product.pk, 'decrease']))
+        self.assertEqual(self.quantities(), {self.product.pk: 2})
+
+        self.client.get(reverse('store:remove_from_cart', args=[self.product.pk]))
+        self.assertEqual(self.quantities(), {})
+
+    def test_mutations_leave_the_session_row_alone(self):
+        self.client.force_login(self.user)
+        urls = [
+            reverse('store:add_to_cart', args=[self.product.pk]),
+            reverse('store:update_cart', args=[self.product.pk, 'increase']),
+            reverse('store:update_cart', args=[self.product.pk, 'decrease']),
+            reverse('store:remove_from_cart', args=[self.product.pk]),
+        ]
+
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            writes = [
+                query['sql'] for query in queries.captured_queries
+                if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')
+            ]
+            self.assertEqual(writes, [], url)
+
+    def test_anonymous_cart_is_merged_on_login(self):
+        other = make_product(name='Other', stock=10)
+        self.client.force_login(self.user)
+        self.client.get(reverse('store:add_to_cart', args=[self.product.pk]))
+        self.client.logout()
+
+        self.client.get(reverse('store:add_to_cart', args=[self.product.pk]))
+        self.client.get(reverse('store:add_to_cart', args=[other.pk]))
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.quantities(), {self.product.pk: 2, other.pk: 1})
+        self.assertFalse(Cart.objects.filter(user=None).exists())
+
+        response = self.client.get(reverse('store:cart'))
+        self.assertEqual(response.context['total'], Decimal('300.00'))
+
+
+    def test_legacy_session_cart_is_merged_on_first_cart_view(self):
+        other = make_product(name='Other', stock=10)
+        self.client.force_login(self.user)
+        self.client.get(reverse('store:add_to_cart', args=[self.product.pk]))
+        # Signed in before carts moved out of the session.
+        session = self.client.session
+        session[LEGACY_SESSION_KEY] = {str(self.product.pk): 1, str(other.pk): 2, 'gone': 1}
+        session.save()
+
+        response = self.client.get(reverse('store:cart'))
+
+        self.assertEqual(self.quantities(), {self.product.pk: 2, other.pk: 2})
+        self.assertEqual(response.context['total'], Decimal('400.00'))
+        self.assertNotIn(LEGACY_SESSION_KEY, self.client.session)
+
+        self.client.get(reverse('store:cart'))
+        self.assertEqual(self.quantities(), {self.product.pk: 2, other.pk: 2})
+
+    def test_legacy_session_cart_reaches_checkout(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session[LEGACY_SESSION_KEY] = {str(self.product.pk): 2}
+        session.save()
+
+        self.client.post(reverse('store:checkout'), {'address': 'Somewhere', 'payment_method': 'COD'})
+
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(list(order.items.values_list('product', 'quantity')), [(self.product.pk, 2)])
+
+class CartResolutionTests(TestCase):
+    def test_resolves_every_product_in_one_query(self):
+        products = [make_product(name=f'Product {index}', price='25.00') for index in range(5)]
+        cart = {str(product.pk): index + 1 for index, product in enumerate(products)}
+
+        with self.assertNumQueries(1):
+            resolved = resolve_cart(cart)
+            lines = [(line.product.name, line.quantity, line.subtotal) for line in resolved]
+
+        self.assertEqual(lines, [
+            (f'Product {index}', index + 1, Decimal('25.00') * (index + 1))
+            for index in range(5)
+        ])
+        self.assertEqual(resolved.total, Decimal('375.00'))
+        self.assertEqual(resolved.stale_ids, [])
+
+    def test_reports_stale_entries(self):
+        kept = make_product(name='Kept')
+        deleted = make_product(name='Deleted')
+        deleted_pk = deleted.pk
+        deleted.delete()
+
+        resolved = resolve_cart({
+            str(kept.pk): '2',
+            str(deleted_pk): 1,
+            'abc': 1,
+            '7': 'many',
+            '8': 0,
+        })
+
+        self.assertEqual([(line.product, line.quantity) for line in resolved], [(kept, 2)])
+        self.assertEqual(sorted(resolved.stale_ids), sorted([str(deleted_pk), 'abc', '7', '8']))
+
+    def test_empty_cart_needs_no_query(self):
+        with self.assertNumQueries(0):
+            resolved = resolve_cart({})
+
+        self.assertFalse(resolved)
+        self.assertEqual(resolved.total, Decimal('0'))
+
+
+# ================= PAGINATION =================
+
+def raw_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+class KeysetCursorTests(TestCase):
+    CRAFTED = [
+        [None], [None, 1], [123, 1], [[1], 1], [{'a': 1}, 1],
+        ['2026-01-01T00:00:00', None], [10 ** 30], [1.5e300, 1], ['NaN', 1], {'a': 1},
+    ]
+
+    def setUp(self):
+        cache.clear()
+        caches['fragments'].clear()
+        self.user = User.objects.create(username='buyer')
+        self.client.force_login(self.user)
+        self.product = make_product(name='Telescope')
+        Order.objects.create(
+            user=self.user, address='Somewhere', total_amount=100,
+            payment_method='COD', payment_status='PENDING'
+        )
+        notify(self.user, 'Order shipped')
+
+    def test_crafted_cursors_decode_to_no_cursor(self):
+        orderings = [(Product, ('id',)), (Product, ('price', 'id')), (Order, ('-created_at', '-id'))]
+        for values in self.CRAFTED:
+            for model, ordering in orderings:
+                self.assertIsNone(decode_cursor(raw_cursor(values), ordering, model), (values, ordering))
+
+    def test_crafted_cursors_fall_back_to_the_first_page(self):
+        pages = [
+            (reverse('store:home'), 'Telescope'),
+            (reverse('store:category_products', args=[self.product.category.slug]), 'Telescope'),
+            (reverse('store:my_orders'), 'Order #'),
+            (reverse('store:notifications'), 'Order shipped'),
+        ]
+        for values in self.CRAFTED + ['!!not-base64!!']:
+            cursor = values if isinstance(values, str) else raw_cursor(values)
+            for url, marker in pages:
+                cache.clear()
+                self.assertContains(self.client.get(url, {'after': cursor}), marker, msg_prefix=f'{url} {values}')
+
+
+class MyOrdersPageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer')
+        self.client.force_login(self.user)
+        self.products = [make_product(name=f'Product {index}') for index in range(4)]
+
+    def place(self, count, quantities=(1, 2)):
+        orders = [
+            Order.objects.create(
+                user=self.user, address='Somewhere', total_amount=100,
+                payment_method='COD', payment_status='PENDING'
+            )
+            for _ in range(count)
+        ]
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, price=product.price, quantity=quantity)
+            for order in orders
+            for product, quantity in zip(self.products, quantities)
+        )
+        return orders
+
+    def page(self, cursor=None):
+        return self.client.get(reverse('store:my_orders'), {'after': cursor} if cursor else {})
+
+    def test_pages_walk_every_order_once(self):
+        orders = self.place(23)
+        # Same timestamp throughout, so only the id breaks the ties.
+        Order.objects.update(created_at=timezone.now())
+
+        seen, sizes, cursor = [], [], None
+        while True:
+            response = self.page(cursor)
+            ids = [order.pk for order in response.context['orders']]
+            seen += ids
+            sizes.append(len(ids))
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(sizes, [10, 10, 3])
+        self.assertEqual(seen, sorted((order.pk for order in orders), reverse=True))
+
+    def test_orders_carry_item_summaries(self):
+        self.place(1, quantities=(1, 2, 3, 4))
+
+        response = self.page()
+        shown, = response.context['orders']
+
+        self.assertEqual((shown.item_count, shown.unit_count), (4, 10))
+        self.assertEqual(
+            [item.product.name for item in shown.preview_items],
+            ['Product 0', 'Product 1', 'Product 2']
+        )
+        self.assertContains(response, '4 items')
+        self.assertContains(response, '10 units')
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.place(2)
+        cache.clear()
+        with CaptureQueriesContext(connection) as short_history:
+            self.page()
+
+        self.place(40, quantities=(1, 2, 3, 4))
+        cache.clear()
+        with CaptureQueriesContext(connection) as long_history:
+            self.page()
+
+        self.assertEqual(len(long_history), len(short_history))
+
+
+# ================= SESSIONS =================
+
+class SessionStoreTests(TestCase):
+    def test_unchanged_sessions_are_not_written_back(self):
+        session = SessionStore()
+        session['cart_id'] = 1
+        session.save()
+
+        session = SessionStore(session.session_key)
+        with self.assertNumQueries(0):
+            session['cart_id'] = 1
+            session.save()
+
+        session['cart_id'] = 2
+        session.save()
+        stored = Session.objects.get(session_key=session.session_key)
+        self.assertEqual(stored.get_decoded(), {'cart_id': 2})
+
+    def test_logout_on_one_worker_ends_the_session_on_the_others(self):
+        # Two cache instances over one directory stand in for two workers
+        # sharing CACHE_BACKEND=file.
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        workers = [FileBasedCache(location.name, {}), FileBasedCache(location.name, {})]
+
+        def session_on(worker, session_key=None):
+            session = SessionStore(session_key)
+            session._cache = workers[worker]
+            return session
+
+        user = User.objects.create(username='buyer')
+        self.client.force_login(user)
+        session_key = self.client.cookies['sessionid'].value
+
+        on_second_worker = session_on(1, session_key)
+        self.assertEqual(on_second_worker['_auth_user_id'], str(user.pk))
+
+        session_on(0, session_key).flush()
+
+        self.assertNotIn('_auth_user_id', session_on(1, session_key).load())
+
+    def test_prune_deletes_expired_sessions_and_abandoned_carts(self):
+        now = timezone.now()
+        for index in range(5):
+            Session.objects.create(
+                session_key=f'expired{index}',
+                session_data='',
+                expire_date=now - timedelta(minutes=1)
+            )
+        Session.objects.create(session_key='live', session_data='', expire_date=now + timedelta(days=1))
+        abandoned = Cart.objects.create()
+        Cart.objects.filter(pk=abandoned.pk).update(created_at=now - timedelta(days=2))
+        fresh = Cart.objects.create()
+        owned = Cart.objects.create(user=User.objects.create(username='buyer'))
+        Cart.objects.filter(pk=owned.pk).update(created_at=now - timedelta(days=2))
+
+        out = StringIO()
+        call_command('prune_sessions', batch_size=2, stdout=out)
+
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+        self.assertEqual(set(Cart.objects.values_list('pk', flat=True)), {fresh.pk, owned.pk})
+        self.assertIn('Deleted 5 expired sessions and 1 abandoned carts.', out.getvalue())
+
+
+# ================= CHECKOUT =================
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer')
+
+    def test_decrements_stock_and_writes_items(self):
+        product = make_product(stock=5)
+        cart = resolve_cart({str(product.pk): 3})
+
+        order = place_order(self.user, cart, 'Somewhere', 'COD')
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 2)
+        self.assertEqual(order.items.get().quantity, 3)
+        self.assertEqual(order.total_amount, 300)
+
+    def test_short_stock_rolls_back_whole_order(self):
+        plenty = make_product(name='Plenty', stock=10)
+        scarce = make_product(name='Scarce', stock=1)
+        cart = resolve_cart({str(plenty.pk): 2, str(scarce.pk): 2})
+
+        with self.assertRaises(OutOfStock):
+            place_order(self.user, cart, 'Somewhere', 'COD')
+
+        plenty.refresh_from_db()
+        self.assertEqual(plenty.stock, 10)
+        self.assertFalse(Order.objects.exists())
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    buyers = 16
+    stock = 5
+
+    def test_concurrent_buyers_never_oversell(self):
+        product = make_product(stock=self.stock)
+        users = [
+            User.objects.create(username=f'buyer{i}')
+            for i in range(self.buyers)
+        ]
+        barrier = threading.Barrier(self.buyers)
+        results = []
+
+        def buy(user):
+            try:
+                cart = resolve_cart({str(product.pk): 1})
+                barrier.wait()
+                while True:
+                    try:
+                        place_order(user, cart, 'Somewhere', 'COD')
+                        results.append('ok')
+                        return
+                    except OutOfStock:
+                        results.append('out_of_stock')
+                        return
+                    except OperationalError:
+                        # The shared in-memory test database reports a locked
+                        # table instead of queueing writers; resubmit.
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        sold = results.count('ok')
+
+        self.assertEqual(len(results), self.buyers)
+        self.assertEqual(sold, self.stock)
+        self.assertEqual(results.count('out_of_stock'), self.buyers - self.stock)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.count(), sold)
+        self.assertEqual(OrderItem.objects.count(), sold)
+
+
+# ================= ORDER STATUS =================
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer')
+
+    def orders(self, *statuses):
+        return [
+            Order.objects.create(
+                user=self.user,
+                address='Somewhere',
+                total_amount='100.00',
+                payment_method='COD',
+                payment_status='PENDING',
+                status=status
+            )
+            for status in statuses
+        ]
+
+    def statuses(self):
+        return list(Order.objects.order_by('pk').values_list('status', flat=True))
+
+    def test_only_allowed_source_statuses_move(self):
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+        for new_status, allowed in ALLOWED_TRANSITIONS.items():
+            with self.subTest(new_status=new_status):
+                Order.objects.all().delete()
+                self.orders(*statuses)
+
+                changed = transition_orders(Order.objects.all(), new_status, "Order #{id}")
+
+                self.assertEqual(changed, len(allowed))
+                self.assertEqual(self.statuses(), [
+                    new_status if status in allowed else status
+                    for status in statuses
+                ])
+
+    def test_skipped_orders_are_not_notified(self):
+        placed = self.orders('PLACED', 'DELIVERED', 'CANCELLED')[0]
+
+        changed = transition_orders(Order.objects.all(), 'CONFIRMED', "📦 Your Order #{id} has been confirmed")
+
+        self.assertEqual(changed, 1)
+        self.assertEqual(
+            list(Notification.objects.values_list('user', 'message')),
+            [(self.user.pk, f"📦 Your Order #{placed.pk} has been confirmed")]
+        )
+
+    def test_chunk_boundaries(self):
+        for count, chunk_size in ((4, 1), (4, 2), (4, 3), (4, 4), (4, 5)):
+            with self.subTest(count=count, chunk_size=chunk_size):
+                Order.objects.all().delete()
+                Notification.objects.all().delete()
+                orders = self.orders(*['PLACED'] * count)
+
+                changed = transition_orders(Order.objects.all(), 'SHIPPED', "Order #{id}", chunk_size=chunk_size)
+
+                self.assertEqual(changed, count)
+                self.assertEqual(self.statuses(), ['SHIPPED'] * count)
+                self.assertEqual(
+                    sorted(Notification.objects.values_list('message', flat=True)),
+                    sorted(f"Order #{order.pk}" for order in orders)
+                )
+
+    def test_admin_action_reports_changed_and_skipped(self):
+        orders = self.orders('PLACED', 'CONFIRMED', 'SHIPPED', 'DELIVERED', 'CANCELLED')
+        self.client.force_login(User.objects.create(username='staff', is_staff=True, is_superuser=True))
+
+        response = self.client.post(reverse('admin:store_order_changelist'), {
+            'action': 'mark_shipped',
+            '_selected_action': [order.pk for order in orders],
+        }, follow=True)
+
+        self.assertEqual(
+            [(message.level_tag, message.message) for message in response.context['messages']],
+            [
+                ('info', "2 order(s) marked as Shipped."),
+                ('warning', "3 order(s) skipped: they cannot move to Shipped from their current status."),
+            ]
+        )
+        self.assertEqual(self.statuses(), ['SHIPPED', 'SHIPPED', 'SHIPPED', 'DELIVERED', 'CANCELLED'])
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+# ================= SALES ROLLUP =================
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer')
+        self.book = make_product(name='Book', stock=50)
+        self.lamp = make_product(Category.objects.create(name='Home', slug='home'), name='Lamp', stock=50)
+
+    def order(self, payment_method='COD', **quantities):
+        cart = resolve_cart({str(getattr(self, name).pk): qty for name, qty in quantities.items()})
+        return place_order(self.user, cart, 'Somewhere', payment_method)
+
+    def rollup(self):
+        return sorted(DailySalesStats.objects.values_list(
+            'date', 'category_id', 'payment_method', 'orders', 'units', 'revenue'
+        ))
+
+    def assertMatchesRebuild(self):
+        live, breakdown = self.rollup(), sales_breakdown()
+        rebuild_sales_stats()
+        self.assertEqual(self.rollup(), live)
+        self.assertEqual(sales_breakdown(), breakdown)
+
+    def test_incremental_rollup_matches_a_rebuild(self):
+        first = self.order(book=2, lamp=1)
+        second = self.order(book=1)
+        third = self.order('ONLINE', lamp=3)
+        self.assertMatchesRebuild()
+
+        transition_orders(Order.objects.filter(pk=first.pk), 'CANCELLED', 'Order #{id} cancelled')
+        self.assertMatchesRebuild()
+
+        second.status = 'CANCELLED'
+        second.save()
+        self.assertMatchesRebuild()
+        second.status = 'PLACED'
+        second.save()
+        self.assertMatchesRebuild()
+
+        third.delete()
+        self.assertMatchesRebuild()
+        Order.objects.filter(pk=second.pk).delete()
+        self.assertMatchesRebuild()
+
+        self.assertEqual(self.rollup(), [])
+        overview = order_overview()
+        self.assertEqual(overview['total_orders'], 1)
+        self.assertEqual(overview['order_status_count']['CANCELLED'], 1)
+
+    def test_sales_stay_in_their_category_after_the_product_moves(self):
+        first = self.order(book=3)
+        Product.objects.filter(pk=self.book.pk).update(category=self.lamp.category)
+        self.order(book=1)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('store:cancel_order', args=[first.pk]))
+
+        self.assertEqual(response.status_code, 302)
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'CANCELLED')
+        self.assertEqual(
+            [(category, units) for _, category, _, _, units, _ in self.rollup()],
+            [(self.lamp.category_id, 1)]
+        )
+        self.assertMatchesRebuild()
+
+    def test_a_drifted_rollup_never_blocks_a_cancellation(self):
+        order = self.order(book=3)
+        DailySalesStats.objects.update(orders=1, units=1, revenue=1)
+
+        transition_orders(Order.objects.filter(pk=order.pk), 'CANCELLED', 'Order #{id} cancelled')
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'CANCELLED')
+        self.assertEqual(self.rollup(), [])
+
+        order = self.order(lamp=1)
+        with mock.patch('store.stats._apply_deltas', side_effect=OperationalError('locked')), \
+                self.assertLogs('store.stats', 'ERROR'):
+            transition_orders(Order.objects.filter(pk=order.pk), 'CANCELLED', 'Order #{id} cancelled')
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'CANCELLED')
+
+    def test_admin_can_cancel_orders(self):
+        placed, shipped = self.order(book=2), self.order(lamp=1)
+        Order.objects.filter(pk=shipped.pk).update(status='SHIPPED')
+        self.client.force_login(User.objects.create(username='staff', is_staff=True, is_superuser=True))
+
+        response = self.client.post(reverse('admin:store_order_changelist'), {
+            'action': 'mark_cancelled',
+            '_selected_action': [placed.pk, shipped.pk],
+        }, follow=True)
+
+        self.assertEqual(
+            [message.message for message in response.context['messages']],
+            [
+                "1 order(s) marked as Cancelled.",
+                "1 order(s) skipped: they cannot move to Cancelled from their current status.",
+            ]
+        )
+        self.assertEqual(
+            dict(Order.objects.values_list('pk', 'status')),
+            {placed.pk: 'CANCELLED', shipped.pk: 'SHIPPED'}
+        )
+        self.assertTrue(Notification.objects.filter(message=f"❌ Order #{placed.pk} cancelled").exists())
+        self.assertMatchesRebuild()
+
+    def test_admin_change_form_leaves_status_alone(self):
+        order = self.order(book=1)
+        self.client.force_login(User.objects.create(username='staff', is_staff=True, is_superuser=True))
+
+        self.client.post(reverse('admin:store_order_change', args=[order.pk]), {
+            'user': self.user.pk,
+            'address': 'Elsewhere',
+            'status': 'CANCELLED',
+            'items-TOTAL_FORMS': 1,
+            'items-INITIAL_FORMS': 1,
+            'items-0-id': order.items.get().pk,
+            'items-0-order': order.pk,
+        })
+
+        order.refresh_from_db()
+        self.assertEqual((order.address, order.status), ('Elsewhere', 'PLACED'))
+        self.assertMatchesRebuild()
+
+
+# ================= INVOICES =================
+
+class InvoiceSnapshotTests(TestCase):
+    def setUp(self):
+        snapshots = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshots.cleanup)
+        self.root = Path(snapshots.name)
+        snapshot_root = override_settings(INVOICE_SNAPSHOT_ROOT=snapshots.name)
+        snapshot_root.enable()
+        self.addCleanup(snapshot_root.disable)
+
+        self.user = User.objects.create(username='buyer')
+        self.client.force_login(self.user)
+        self.product = make_product(name='Desk Lamp', stock=10)
+
+    def order(self, user=None, status='DELIVERED'):
+        cart = resolve_cart({str(self.product.pk): 1})
+        order = place_order(user or self.user, cart, 'Somewhere', 'COD')
+        Order.objects.filter(pk=order.pk).update(status=status)
+        return order
+
+    def snapshots(self):
+        return sorted(path.name for path in self.root.iterdir())
+
+    def test_terminal_orders_are_rendered_once(self):
+        order = self.order()
+
+        self.client.get(reverse('store:invoice', kwargs={'order_id': order.pk}))
+        self.client.get(reverse('store:invoice_pdf', kwargs={'order_id': order.pk}))
+        self.assertEqual(len(self.snapshots()), 2)
+
+        OrderItem.objects.filter(order=order).delete()
+        response = self.client.get(reverse('store:invoice', kwargs={'order_id': order.pk}))
+        self.assertContains(response, 'Desk Lamp')
+
+    def test_open_orders_are_rendered_live(self):
+        order = self.order(status='SHIPPED')
+
+        response = self.client.get(reverse('store:invoice', kwargs={'order_id': order.pk}))
+
+        self.assertContains(response, 'Desk Lamp')
+        self.assertEqual(self.snapshots(), [])
+
+        OrderItem.objects.filter(order=order).update(quantity=7)
+        response = self.client.get(reverse('store:invoice_pdf', kwargs={'order_id': order.pk}))
+        self.assertIn(b'Desk Lamp', response.content)
+        self.assertEqual(self.snapshots(), [])
+
+    def test_unchanged_pdf_is_not_sent_again(self):
+        order = self.order()
+        url = reverse('store:invoice_pdf', kwargs={'order_id': order.pk})
+
+        first = self.client.get(url)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+    def test_snapshot_is_not_served_for_a_reused_order_id(self):
+        order = self.order()
+        url = reverse('store:invoice', kwargs={'order_id': order.pk})
+        self.client.get(url)
+        order_id = order.pk
+        order.delete()
+
+        # A flush or restore hands the same id to somebody else's order.
+        stranger = User.objects.create(username='stranger')
+        Order.objects.create(
+            pk=order_id,
+            user=stranger,
+            address='Their house',
+            total_amount='100.00',
+            payment_method='COD',
+            payment_status='PENDING',
+            status='DELIVERED'
+        )
+        self.client.force_login(stranger)
+
+        response = self.client.get(url)
+
+        self.assertContains(response, 'Their house')
+        self.assertNotContains(response, 'Somewhere')
+
+
+# ================= EMAIL QUEUE =================
+
+class EmailQueueTests(TestCase):
+    def test_register_queues_verification_mail(self):
+        response = self.client.post(reverse('store:register'), {
+            'username': 'newbie',
+            'email': 'newbie@example.com',
+            'password': 'secret123',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual(queued.recipients, ['newbie@example.com'])
+        self.assertIn('/verify-email/', queued.body)
+
+    def test_password_reset_queues_mail(self):
+        User.objects.create_user('forgetful', 'forgetful@example.com', 'secret123')
+
+        self.client.post(reverse('store:password_reset'), {'email': 'forgetful@example.com'})
+
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutgoingEmail.objects.get().recipients, ['forgetful@example.com'])
+
+    def test_worker_sends_batch_and_marks_sent(self):
+        for i in range(3):
+            enqueue_mail('Hello', 'Body', [f'user{i}@example.com'])
+
+        call_command('send_queued_mail', stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutgoingEmail.objects.exclude(status='SENT').exists())
+
+    def test_failed_send_is_retried_with_backoff(self):
+        email = enqueue_mail('Hello', 'Body', ['user@example.com'])
+
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=SMTPException('try later')
+        ):
+            self.assertEqual(send_queued_mail(), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'PENDING')
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Not due yet, so nothing is picked up.
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    def test_gives_up_after_max_attempts(self):
+        email = enqueue_mail('Hello', 'Body', ['user@example.com'])
+
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=SMTPException('mailbox gone')
+        ):
+            send_queued_mail(max_attempts=1)
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'FAILED')
+        self.assertEqual(email.last_error, 'mailbox gone')
+
+
+# ================= SEARCH =================
+
+class ProductSearchTests(TestCase):
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query).values_list('name', flat=True))
+
+    def test_prefix_terms_must_all_match(self):
+        make_product(name='Blue Running Shoes')
+        make_product(name='Blue Teapot')
+
+        self.assertEqual(self.search('blu runn'), ['Blue Running Shoes'])
+
+    def test_name_matches_rank_above_description_matches(self):
+        make_product(name='Kettle', description='Pairs well with a teapot')
+        make_product(name='Teapot', description='Ceramic')
+
+        self.assertEqual(self.search('teapot'), ['Teapot', 'Kettle'])
+
+    def test_index_follows_saves_and_deletes(self):
+        product = make_product(name='Old Name')
+        product.name = 'Telescope'
+        product.save()
+
+        self.assertEqual(self.search('old'), [])
+        self.assertEqual(self.search('tele'), ['Telescope'])
+
+        product.delete()
+        self.assertEqual(self.search('tele'), [])
+
+    def test_search_composes_with_other_filters(self):
+        books = Category.objects.create(name='Books', slug='books')
+        make_product(books, name='Telescope Handbook')
+        make_product(name='Telescope')
+
+        found = search_products(Product.objects.filter(category=books), 'tele')
+
+        self.assertEqual(list(found.values_list('name', flat=True)), ['Telescope Handbook'])
+        self.assertEqual(found.count(), 1)
+
+    def test_admin_changelist_uses_index(self):
+        make_product(name='Telescope')
+        make_product(name='Microscope')
+        admin_user = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+
+        response = self.client.get(reverse('admin:store_product_changelist'), {'q': 'tele'})
+
+        self.assertEqual(
+            [product.name for product in response.context['cl'].result_list],
+            ['Telescope']
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL full-text search')
+class PostgresSearchTests(TestCase):
+    def search(self, query, ranked=True):
+        return search_products(Product.objects.all(), query, ranked=ranked)
+
+    def test_prefix_terms_must_all_match(self):
+        make_product(name='Blue Running Shoes')
+        make_product(name='Blue Teapot')
+
+        self.assertEqual(list(self.search('blu runn').values_list('name', flat=True)), ['Blue Running Shoes'])
+        self.assertEqual(list(self.search('blu runn', ranked=False).values_list('name', flat=True)), ['Blue Running Shoes'])
+
+    def test_name_matches_rank_above_description_matches(self):
+        make_product(name='Kettle', description='Pairs well with a teapot')
+        make_product(name='Teapot', description='Ceramic')
+
+        self.assertEqual(list(self.search('teapot').values_list('name', flat=True)), ['Teapot', 'Kettle'])
+
+    def test_queries_use_the_indexed_vector(self):
+        sql = str(self.search('teapot').query)
+
+        # Must match the GIN expression from migration 0014.
+        self.assertIn('to_tsvector', sql)
+        self.assertIn('@@', sql)
+        self.assertIn('ts_rank', sql)
+
+
+# ================= AUTOCOMPLETE =================
+
+class AutocompleteTests(TestCase):
+    def complete(self, query):
+        return [name for _, name in autocomplete.complete(query)]
+
+    def test_prefixes_rank_by_units_sold(self):
+        index = autocomplete.PrefixIndex.from_rows([
+            (1, 'Blue Running Shoes', 5),
+            (2, 'Blue Teapot', 40),
+            (3, 'Blüe Kettle', 0),
+            (4, 'Red Shoes', 90),
+        ])
+
+        self.assertEqual([pk for pk, _ in index.complete('b')], [2, 1, 3])
+        self.assertEqual([pk for pk, _ in index.complete('blue')], [2, 1, 3])
+        self.assertEqual([pk for pk, _ in index.complete('sho blu')], [1])
+        self.assertEqual([pk for pk, _ in index.complete('blue shoes', limit=1)], [1])
+        self.assertEqual(index.complete('green'), [])
+        self.assertEqual(index.complete(''), [])
+
+    def test_patched_copy_matches_a_rebuild(self):
+        rows = [(pk, f'Item {pk} {"Blue" if pk % 2 else "Red"}', pk % 7) for pk in range(1, 300)]
+        index = autocomplete.PrefixIndex.from_rows(rows)
+
+        patched = index.patched(upserts=[(5, 'Red Lantern'), (400, 'Blue Lantern')], deletes=[7])
+        rows = [row for row in rows if row[0] not in (5, 7)] + [(5, 'Red Lantern', 5), (400, 'Blue Lantern', 0)]
+        rebuilt = autocomplete.PrefixIndex.from_rows(rows)
+
+        for query in ('b', 'bl', 'blue', 're', 'red lan', 'l', 'item 1', 'i'):
+            with self.subTest(query=query):
+                self.assertEqual(patched.complete(query), rebuilt.complete(query))
+        self.assertEqual(index.complete('lantern'), [])
+
+    def test_index_follows_committed_saves_and_deletes(self):
+        product = make_product(name='Old Name')
+        autocomplete.warm()
+
+        product.name = 'Telescope'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(self.complete('tel'), ['Telescope'])
+        self.assertEqual(self.complete('old'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.complete('tel'), [])
+
+    def rebuild_due(self):
+        with mock.patch.object(autocomplete, '_last_check', 0.0), \
+                mock.patch.object(autocomplete, '_last_rebuild', 0.0), \
+                mock.patch('store.autocomplete.threading.Thread') as thread:
+            autocomplete._maybe_refresh()
+        return thread.called
+
+    def test_only_name_changes_elsewhere_trigger_a_rebuild(self):
+        cache.clear()
+        product = make_product(name='Telescope', stock=5)
+        autocomplete.warm()
+        self.assertFalse(self.rebuild_due())
+
+        # Stock changes and sell-outs bump the catalog, not the index.
+        product.stock = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        bump_catalog_version()
+        self.assertFalse(self.rebuild_due())
+
+        # A rename patched here is already current here...
+        product.name = 'Microscope'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(self.complete('micro'), ['Microscope'])
+        self.assertFalse(self.rebuild_due())
+
+        # ...while one patched by another worker is not.
+        autocomplete.bump_index_version()
+        self.assertTrue(self.rebuild_due())
+
+    def test_endpoint_answers_without_queries(self):
+        product = make_product(name='Telescope')
+        autocomplete.warm()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('store:autocomplete'), {'q': 'tele'})
+
+        self.assertEqual(response.json(), {'results': [{
+            'id': product.pk,
+            'name': 'Telescope',
+            'url': reverse('store:product_detail', args=[product.pk]),
+        }]})
+
+
+# ================= CATALOG =================
+
+class CatalogPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [make_product(name=f'Product {index}') for index in range(CATALOG_PAGE_SIZE + 2)]
+
+    def test_cached_page_is_served_without_queries_or_rendering(self):
+        first = get_catalog_page()
+
+        with self.assertNumQueries(0), \
+                mock.patch('store.catalog.render_to_string', side_effect=AssertionError):
+            self.assertEqual(get_catalog_page(), first)
+
+    def test_saves_and_deletes_make_the_page_stale(self):
+        self.assertIn('Product 0', get_catalog_page())
+
+        self.products[0].name = 'Telescope'
+        self.products[0].save()
+        grid = get_catalog_page()
+        self.assertIn('Telescope', grid)
+        self.assertNotIn('Product 0<', grid)
+
+        self.products[0].delete()
+        self.assertNotIn('Telescope', get_catalog_page())
+
+    def test_later_pages_are_cached_separately(self):
+        first = get_catalog_page()
+        cursor = encode_cursor(self.products[CATALOG_PAGE_SIZE - 1], CATALOG_ORDERING, Product)
+
+        second = get_catalog_page(cursor)
+
+        self.assertNotEqual(second, first)
+        self.assertIn(f'Product {CATALOG_PAGE_SIZE}', second)
+        self.assertEqual(get_catalog_page(cursor + '=='), second)
+
+    def test_malformed_cursors_share_the_first_page_entry(self):
+        first = get_catalog_page()
+        stored = mock.Mock(wraps=cache.set)
+
+        with self.assertNumQueries(0), mock.patch('store.catalog.cache.set', stored):
+            for junk in ['!!', 'bnVsbA', raw_cursor(['x']), raw_cursor([None]), 'W10']:
+                self.assertEqual(get_catalog_page(junk), first)
+
+        stored.assert_not_called()
+
+
+class CategoryPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Gadgets', slug='gadgets')
+        self.client.force_login(User.objects.create(username='buyer'))
+
+    def get(self, **params):
+        return self.client.get(reverse('store:category_products', args=[self.category.slug]), params)
+
+    def test_price_filter_is_inclusive_on_both_ends(self):
+        for price in ('50.00', '100.00', '150.00', '200.00'):
+            make_product(self.category, name=f'Costs {price}', price=price)
+
+        response = self.get(min_price='100', max_price='150')
+
+        self.assertEqual(
+            [product.name for product in response.context['products']],
+            ['Costs 100.00', 'Costs 150.00']
+        )
+        self.assertEqual(response.context['filter_query'], 'min_price=100&max_price=150')
+
+    def test_keyset_walk_visits_tied_prices_once(self):
+        products = [
+            make_product(self.category, name=f'Tied {index}', price=('10.00', '20.00', '30.00')[index % 3])
+            for index in range(CATEGORY_PAGE_SIZE * 2 + 5)
+        ]
+
+        seen, params = [], {}
+        while True:
+            page = self.get(**params).context['products']
+            seen += [product.pk for product in page]
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+
+        self.assertEqual(
+            seen,
+            [product.pk for product in sorted(products, key=lambda product: (product.price, product.pk))]
+        )
+
+    def test_histogram_buckets(self):
+        for price in ('5.00', '12.00', '14.99', '19.00', '31.00'):
+            make_product(self.category, price=price)
+
+        self.assertEqual(
+            [
+                (bucket['min_price'], bucket['max_price'], bucket['count'])
+                for bucket in self.get().context['price_buckets']
+            ],
+            [
+                (Decimal('5'), Decimal('9.99'), 1),
+                (Decimal('10'), Decimal('14.99'), 2),
+                (Decimal('15'), Decimal('19.99'), 1),
+                (Decimal('20'), Decimal('24.99'), 0),
+                (Decimal('25'), Decimal('29.99'), 0),
+                (Decimal('30'), Decimal('34.99'), 1),
+            ]
+        )
+
+    def test_histogram_is_cached_until_the_catalog_changes(self):
+        product = make_product(self.category, price='5.00')
+        make_product(self.category, price='31.00')
+        first = get_price_histogram(self.category)
+
+        # A queryset update sends no signal, so only an explicit bump
+        # refreshes the cached buckets.
+        Product.objects.filter(pk=product.pk).update(price='26.00')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_price_histogram(self.category), first)
+
+        bump_catalog_version()
+        self.assertEqual(
+            [(bucket['min_price'], bucket['count']) for bucket in get_price_histogram(self.category)],
+            [(Decimal(26), 1), (Decimal(27), 0), (Decimal(28), 0), (Decimal(29), 0), (Decimal(30), 0), (Decimal(31), 1)]
+        )
+
+
+# ================= STATIC PAGES =================
+
+class StaticPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('store:privacy_policy')
+
+    def test_anonymous_repeats_skip_rendering_and_queries(self):
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0), mock.patch('store.pages.render', side_effect=AssertionError):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('public', second['Cache-Control'])
+
+    def test_conditional_requests_are_not_modified(self):
+        first = self.client.get(self.url)
+
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': first['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': first['Last-Modified']},
+        ):
+            with self.assertNumQueries(0):
+                response = self.client.get(self.url, **headers)
+            self.assertEqual(response.status_code, 304)
+
+    def test_signed_in_etag_follows_the_navbar(self):
+        user = User.objects.create(username='buyer')
+        self.client.force_login(user)
+
+        first = self.client.get(self.url)
+        self.assertIn('private', first['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notify(user, 'Order shipped')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 200)
+
+
+# ================= PRODUCT PAGES =================
+
+class ProductPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['fragments'].clear()
+        self.product = make_product(name='Telescope', stock=10)
+        self.client.force_login(User.objects.create(username='buyer'))
+        self.url = reverse('store:product_detail', args=[self.product.pk])
+
+    def revalidate(self, etag):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_product_is_not_modified(self):
+        first = self.client.get(self.url)
+
+        self.assertEqual(self.revalidate(first['ETag']).status_code, 304)
+        self.assertIn('Last-Modified', first)
+
+    def test_edits_and_stock_changes_revalidate(self):
+        etag = self.client.get(self.url)['ETag']
+
+        Product.objects.filter(pk=self.product.pk).update(stock=0)
+        response = self.revalidate(etag)
+        self.assertContains(response, 'Out of Stock')
+
+        self.product.refresh_from_db()
+        self.product.name = 'Microscope'
+        self.product.save()
+        response = self.revalidate(response['ETag'])
+        self.assertContains(response, 'Microscope')
+
+    def test_fragments_are_reused_while_stock_stays_live(self):
+        self.client.get(self.url)
+        Product.objects.filter(pk=self.product.pk).update(stock=0)
+
+        with mock.patch('store.templatetags.store_images.has_variants') as has_variants:
+            response = self.client.get(self.url)
+
+        has_variants.assert_not_called()
+        self.assertContains(response, 'Telescope')
+        self.assertContains(response, 'Currently Unavailable')
+
+
+# ================= PRODUCT IMAGES =================
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = Path(media.name)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def upload(self, image, name='lamp.png'):
+        buffer = BytesIO()
+        image.save(buffer, 'PNG')
+        return make_product(image=SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png'))
+
+    def variant(self, product, variant, ext):
+        return Image.open(self.media / variant_name(product.image.name, variant, ext))
+
+    def test_upload_gets_resized_variants(self):
+        product = self.upload(Image.new('RGB', (1200, 600), 'navy'))
+
+        for variant, width in IMAGE_VARIANTS.items():
+            for ext, fmt in IMAGE_FORMATS:
+                with self.subTest(variant=variant, ext=ext), self.variant(product, variant, ext) as image:
+                    self.assertEqual(image.format, fmt)
+                    self.assertEqual(image.size, (width, width // 2))
+
+    def test_transparent_areas_stay_light_in_jpeg(self):
+        # Left half opaque red, right half fully transparent black.
+        source = Image.new('RGBA', (800, 800), (0, 0, 0, 0))
+        source.paste((200, 0, 0, 255), (0, 0, 400, 800))
+        product = self.upload(source)
+
+        with self.variant(product, 'thumb', 'jpg') as jpeg:
+            left, right = jpeg.getpixel((50, 200)), jpeg.getpixel((350, 200))
+        with self.variant(product, 'thumb', 'webp') as webp:
+            transparent = webp.convert('RGBA').getpixel((350, 200))
+
+        self.assertGreater(left[0], 150)
+        self.assertTrue(all(channel > 240 for channel in right), right)
+        self.assertEqual(transparent[3], 0)
+
+    def test_picture_tag_lists_every_width(self):
+        product = self.upload(Image.new('RGB', (1200, 600), 'navy'))
+        placeholder = make_product()
+
+        html = Template(
+            "{% load store_images %}{% product_picture product 'medium' sizes='50vw' %}"
+        ).render(Context({'product': product}))
+        fallback = Template(
+            "{% load store_images %}{% product_picture product %}"
+        ).render(Context({'product': placeholder}))
+
+        stem = os.path.splitext(product.image.name)[0]
+        self.assertIn(
+            f'<source type="image/webp" srcset="/media/derived/{stem}_thumb.webp 400w, '
+            f'/media/derived/{stem}_medium.webp 900w" sizes="50vw">',
+            html
+        )
+        self.assertIn(f'<img src="/media/derived/{stem}_medium.jpg"', html)
+        self.assertIn(f'/media/derived/{stem}_thumb.jpg 400w, /media/derived/{stem}_medium.jpg 900w', html)
+        self.assertIn('src="/media/products/placeholder.jpg"', fallback)
+        self.assertNotIn('<picture>', fallback)
+
+
+# ================= NOTIFICATIONS =================
+
+class NotificationSummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='buyer')
+        self.client.force_login(self.user)
+
+    def unread(self):
+        return unread_summary(self.user)['unread_count']
+
+    def test_warm_render_does_not_query_notifications(self):
+        notify_many([(self.user.pk, 'Hello'), (self.user.pk, 'Again')])
+        self.client.get(reverse('store:contact'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('store:contact'))
+
+        self.assertEqual(response.context['unread_count'], 2)
+        self.assertFalse(any(
+            Notification._meta.db_table in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_creating_invalidates_the_summary(self):
+        self.assertEqual(self.unread(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            notify(self.user, 'Hello')
+        self.assertEqual(self.unread(), 1)
+
+    def test_reading_the_page_invalidates_the_summary(self):
+        notify_many([(self.user.pk, 'Hello'), (self.user.pk, 'Again')])
+        self.assertEqual(self.unread(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('store:notifications'))
+        self.assertEqual(self.unread(), 0)
+
+    def test_deleting_invalidates_the_summary(self):
+        first, _ = notify_many([(self.user.pk, 'Hello'), (self.user.pk, 'Again')])
+        self.assertEqual(self.unread(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('store:delete_notification', args=[first.pk]))
+        self.assertEqual(self.unread(), 1)
+
+    def test_clearing_invalidates_the_summary(self):
+        notify_many([(self.user.pk, 'Hello'), (self.user.pk, 'Again')])
+        self.assertEqual(self.unread(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('store:clear_notifications'))
+        self.assertEqual(self.unread(), 0)
+
+    def test_admin_actions_invalidate_the_summary(self):
+        delivered, cancelled = (
+            Order.objects.create(
+                user=self.user,
+                address='Somewhere',
+                total_amount='100.00',
+                payment_method='COD',
+                payment_status='PENDING'
+            )
+            for _ in range(2)
+        )
+        self.client.force_login(User.objects.create(username='staff', is_staff=True, is_superuser=True))
+        steps = [
+            ('mark_confirmed', delivered),
+            ('mark_shipped', delivered),
+            ('mark_delivered', delivered),
+            ('mark_cancelled', cancelled),
+        ]
+
+        for expected, (action, order) in enumerate(steps, start=1):
+            with self.subTest(action=action):
+                self.unread()
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(reverse('admin:store_order_changelist'), {
+                        'action': action,
+                        '_selected_action': [order.pk],
+                    })
+                self.assertEqual(self.unread(), expected)
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='buyer')
+
+    def test_page_marks_only_the_rows_shown_as_read(self):
+        notify_many((self.user.pk, f'Update {i}') for i in range(views.NOTIFICATIONS_PER_PAGE + 5))
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('store:notifications'))
+        self.assertContains(response, 'New', count=views.NOTIFICATIONS_PER_PAGE)
+        self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), 5)
+
+        older = self.client.get(reverse('store:notifications'), {'after': response.context['next_cursor']})
+        self.assertContains(older, 'Update 0')
+        self.assertIsNone(older.context['next_cursor'])
+        self.assertFalse(Notification.objects.filter(user=self.user, is_read=False).exists())
+
+    @override_settings(NOTIFICATION_RETENTION_DAYS=30, NOTIFICATION_MAX_PER_USER=3)
+    def test_prune_applies_age_and_per_user_cap(self):
+        other = User.objects.create(username='other')
+        old = notify_many([(self.user.pk, 'Old'), (other.pk, 'Old')])
+        Notification.objects.filter(pk__in=[n.pk for n in old]).update(
+            created_at=timezone.now() - timedelta(days=31)
+        )
+        notify_many((self.user.pk, f'Update {i}') for i in range(5))
+        notify_many([(other.pk, 'Update')])
+        self.assertEqual(unread_summary(self.user)['unread_count'], 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('prune_notifications', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(
+            list(self.user.notifications.order_by('pk').values_list('message', flat=True)),
+            ['Update 2', 'Update 3', 'Update 4']
+        )
+        self.assertEqual(list(other.notifications.values_list('message', flat=True)), ['Update'])
+        self.assertEqual(unread_summary(self.user)['unread_count'], 3)
+
+
+# ================= ASYNC VIEWS =================
+
+class AsyncViewTests(TestCase):
+    ROUTES = ('home', 'product_detail', 'my_orders', 'notifications')
+
+    def setUp(self):
+        cache.clear()
+        caches['fragments'].clear()
+        self.user = User.objects.create(username='buyer')
+        self.client.force_login(self.user)
+        self.product = make_product(name='Telescope', stock=10)
+        for _ in range(views.ORDERS_PER_PAGE + 1):
+            Order.objects.create(
+                user=self.user, address='Somewhere', total_amount=100,
+                payment_method='COD', payment_status='PENDING'
+            )
+
+    def routed_to(self, module):
+        patterns = [p for p in store_urls.urlpatterns if p.name in self.ROUTES]
+        return [
+            mock.patch.object(pattern, 'callback', getattr(module, pattern.callback.__name__))
+            for pattern in patterns
+        ]
+
+    def fetch(self, module, url):
+        notify(self.user, 'Order shipped')
+        patches = self.routed_to(module)
+        for patch in patches:
+            patch.start()
+        try:
+            cache.clear()
+            caches['fragments'].clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            return response, len(queries)
+        finally:
+            for patch in patches:
+                patch.stop()
+
+    def test_async_twins_match_the_sync_views(self):
+        newest = Order.objects.latest('pk')
+        cases = [
+            (reverse('store:home'), 'Telescope'),
+            (reverse('store:product_detail', args=[self.product.pk]), 'Telescope'),
+            (reverse('store:my_orders'), f'Order #{newest.pk}'),
+            (reverse('store:notifications'), 'Order shipped'),
+        ]
+        for url, marker in cases:
+            expected, expected_queries = self.fetch(views, url)
+            response, queries = self.fetch(async_views, url)
+
+            self.assertContains(expected, marker)
+            self.assertContains(response, marker)
+            self.assertEqual(queries, expected_queries, url)
+
+        self.assertFalse(Notification.objects.filter(user=self.user, is_read=False).exists())
+
+
+# ================= LIVE NOTIFICATIONS =================
+
+@override_settings(STORE_LIVE_NOTIFICATIONS=True)
+class LiveNotificationTests(TestCase):
+    async def open_stream(self, user, last_id=0):
+        events = live.notification_events(user.pk, last_id)
+        self.assertTrue((await anext(events)).startswith('retry:'))
+        return events
+
+    def parse(self, chunk):
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        return int(fields['id']), json.loads(fields['data'])
+
+    async def test_stream_replays_missed_then_pushes_new(self):
+        user = await User.objects.acreate(username='buyer')
+        seen = await Notification.objects.acreate(user=user, message='Order placed')
+        await Notification.objects.acreate(user=user, message='Order confirmed')
+
+        with mock.patch('store.live.LIVE_POLL_INTERVAL', 0):
+            events = await self.open_stream(user, last_id=seen.pk)
+            event_id, data = self.parse(await anext(events))
+            self.assertEqual(event_id, seen.pk + 1)
+            self.assertEqual(data['message'], 'Order confirmed')
+            self.assertEqual(data['unread_count'], 2)
+
+            await Notification.objects.acreate(user=user, message='Order shipped')
+            _, data = self.parse(await anext(events))
+            self.assertEqual((data['message'], data['unread_count']), ('Order shipped', 3))
+
+            await events.aclose()
+            await live.get_broker().task
+
+        self.assertEqual(live.get_broker().subscribers, {})
+
+    async def test_replay_runs_after_the_broker_cursor_is_fixed(self):
+        user = await User.objects.acreate(username='buyer')
+        await Notification.objects.acreate(user=user, message='Order placed')
+        replay = live.missed_events
+        cursors = []
+
+        async def replay_then_notify(user_id, last_id):
+            cursors.append(live.get_broker().cursor)
+            missed = await replay(user_id, last_id)
+            # Lands after the replay query; only the poller can deliver it.
+            await Notification.objects.acreate(user=user, message='Order shipped')
+            return missed
+
+        with mock.patch('store.live.LIVE_POLL_INTERVAL', 0), \
+                mock.patch('store.live.missed_events', replay_then_notify):
+            events = await self.open_stream(user)
+            messages = [self.parse(await anext(events))[1]['message'] for _ in range(2)]
+            await events.aclose()
+            await live.get_broker().task
+
+        self.assertIsNotNone(cursors[0])
+        self.assertEqual(messages, ['Order placed', 'Order shipped'])
+
+    async def test_idle_stream_sends_heartbeats(self):
+        user = await User.objects.acreate(username='buyer')
+
+        with mock.patch('store.live.LIVE_HEARTBEAT_INTERVAL', 0.01), \
+                mock.patch('store.live.LIVE_POLL_INTERVAL', 0):
+            events = await self.open_stream(user)
+            self.assertEqual(await anext(events), ': keepalive\n\n')
+            await events.aclose()
+            await live.get_broker().task
+
+    async def test_endpoint_streams_to_signed_in_users_only(self):
+        url = reverse('store:notification_stream')
+        self.assertEqual((await self.async_client.get(url)).status_code, 204)
+
+        await self.async_client.aforce_login(await User.objects.acreate(username='buyer'))
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    def test_one_poll_serves_every_connection(self):
+        buyer, other, offline = (User.objects.create(username=name) for name in ('a', 'b', 'c'))
+        broker = live.Broker()
+        broker.cursor = 0
+        tabs = [asyncio.Queue(), asyncio.Queue()]
+        other_tab = asyncio.Queue()
+        broker.subscribers = {buyer.pk: set(tabs), other.pk: {other_tab}}
+
+        notify_many([
+            (buyer.pk, 'Order shipped'),
+            (other.pk, 'Order confirmed'),
+            (offline.pk, 'Order placed'),
+        ])
+        with self.assertNumQueries(2):
+            async_to_sync(broker.poll)()
+
+        for tab in tabs:
+            self.assertEqual(tab.get_nowait()['message'], 'Order shipped')
+        self.assertEqual(other_tab.get_nowait()['unread_count'], 1)
+
+        with self.assertNumQueries(1):
+            async_to_sync(broker.poll)()
+        self.assertTrue(all(tab.empty() for tab in tabs + [other_tab]))
+
+
+# ================= PERFORMANCE SAMPLING =================
+
+class PerformanceSamplingTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(perf, 'samples', deque(maxlen=perf.PERF_BUFFER_SIZE))
+        self.samples = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.product = make_product(name='Desk Lamp')
+        self.client.force_login(User.objects.create(username='buyer'))
+
+    def product_page(self):
+        return self.client.get(reverse('store:product_detail', kwargs={'product_id': self.product.pk}))
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_disabled_at_zero(self):
+        self.product_page()
+        self.assertEqual(len(self.samples), 0)
+
+    @override_settings(PERF_SAMPLE_RATE=0.5)
+    def test_samples_a_fraction_of_requests(self):
+        with mock.patch('store.middleware.random.random', side_effect=[0.7, 0.2, 0.5]):
+            for _ in range(3):
+                self.product_page()
+
+        self.assertEqual(len(self.samples), 1)
+
+    @override_settings(PERF_SAMPLE_RATE=1)
+    def test_captures_queries_and_timings(self):
+        cache.clear()
+        caches['fragments'].clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.product_page()
+
+        sample, = self.samples
+        self.assertEqual(sample['view'], 'store:product_detail')
+        self.assertEqual((sample['method'], sample['status']), ('GET', 200))
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(sample['queries'], len(queries))
+        self.assertGreater(sample['db_ms'], 0)
+        self.assertGreater(sample['template_ms'], 0)
+        self.assertGreaterEqual(sample['wall_ms'], sample['db_ms'] + sample['template_ms'])
+
+    def test_flags_repeated_statements(self):
+        stats = perf.RequestStats()
+        execute = mock.Mock()
+        for sql in ['SELECT 1'] * perf.PERF_DUPLICATE_THRESHOLD + ['SELECT 2']:
+            stats(execute, sql, (), False, {})
+
+        self.assertEqual(stats.queries, perf.PERF_DUPLICATE_THRESHOLD + 1)
+        self.assertEqual(stats.duplicates(), [('SELECT 1', perf.PERF_DUPLICATE_THRESHOLD)])
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_summary_page(self):
+        for wall_ms, queries in ((10, 2), (30, 4), (20, 3)):
+            self.samples.append({
+                'view': 'store:home', 'method': 'GET', 'status': 200,
+                'wall_ms': wall_ms, 'queries': queries, 'db_ms': 1.0, 'template_ms': 2.0,
+                'duplicates': [('SELECT 1', 3)] if queries == 4 else [], 'at': time.time(),
+            })
+        self.samples.append({
+            'view': 'store:cart', 'method': 'GET', 'status': 200,
+            'wall_ms': 50, 'queries': 1, 'db_ms': 1.0, 'template_ms': 2.0,
+            'duplicates': [], 'at': time.time(),
+        })
+        self.client.force_login(User.objects.create(username='staff', is_staff=True, is_superuser=True))
+
+        response = self.client.get(reverse('admin:performance'))
+
+        self.assertEqual(response.context['sample_count'], 4)
+        self.assertEqual([row['view'] for row in response.context['views']], ['store:cart', 'store:home'])
+        home = response.context['views'][1]
+        self.assertEqual((home['requests'], home['p50_ms'], home['p95_ms']), (3, 20, 30))
+        self.assertEqual((home['avg_queries'], home['max_queries'], home['duplicate_requests']), (3, 4, 1))
+        self.assertEqual([sample['wall_ms'] for sample in response.context['slowest']], [50, 30, 20, 10])
+        self.assertEqual([sample['queries'] for sample in response.context['duplicate_suspects']], [4])
+        self.assertContains(response, 'SELECT 1')
+
+
+# ================= MONITORING =================
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        self.path = os.path.join(location.name, 'metrics.sqlite3')
+        for name, value in (
+            ('_store', metrics.SharedStore(self.path)),
+            ('_pending', defaultdict(float)),
+        ):
+            patcher = mock.patch.object(metrics.registry, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def scrape(self, **headers):
+        return self.client.get(reverse('store:metrics'), headers=headers)
+
+    def test_closed_by_default(self):
+        self.assertEqual(self.scrape().status_code, 403)
+
+        self.client.force_login(User.objects.create(username='buyer'))
+        self.assertEqual(self.scrape().status_code, 403)
+
+        self.client.force_login(User.objects.create(username='staff', is_staff=True))
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_scrapers_need_the_token(self):
+        self.assertEqual(self.scrape(authorization='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape(authorization='Bearer secret').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_exposition_format(self):
+        metrics.inc('store_orders_placed_total', 2)
+        metrics.observe('store_http_request_duration_seconds', 0.02, view='store:home')
+        metrics.record_cache_lookup('fragments', True)
+        metrics.record_cache_lookup('fragments', False)
+
+        response = self.scrape(authorization='Bearer secret')
+        lines = response.content.decode().splitlines()
+
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn('# TYPE store_orders_placed_total counter', lines)
+        self.assertIn('store_orders_placed_total 2', lines)
+        self.assertIn('# TYPE store_http_request_duration_seconds histogram', lines)
+        self.assertIn('store_http_request_duration_seconds_bucket{view="store:home",le="0.01"} 0', lines)
+        self.assertIn('store_http_request_duration_seconds_bucket{view="store:home",le="0.025"} 1', lines)
+        self.assertIn('store_http_request_duration_seconds_bucket{view="store:home",le="+Inf"} 1', lines)
+        self.assertIn('store_http_request_duration_seconds_count{view="store:home"} 1', lines)
+        self.assertIn('store_cache_hit_ratio{cache="fragments"} 0.5', lines)
+        self.assertIn('store_email_queue_depth 0', lines)
+
+        buckets = [line for line in lines if line.startswith('store_http_request_duration_seconds_bucket')]
+        self.assertTrue(buckets[-1].startswith('store_http_request_duration_seconds_bucket{view="store:home",le="+Inf"}'))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_counters_from_other_processes_are_summed(self):
+        metrics.inc('store_orders_placed_total', 2)
+        metrics.registry.flush(force=True)
+
+        # Another worker: its own registry, the same shared file.
+        worker = (
+            'import sys\n'
+            'from store import metrics\n'
+            'registry = metrics.Registry()\n'
+            'registry._store = metrics.SharedStore(sys.argv[1])\n'
+            'registry.inc("store_orders_placed_total", 3)\n'
+            'registry.flush(force=True)\n'
+        )
+        subprocess.run(
+            [sys.executable, '-c', worker, self.path],
+            cwd=Path(__file__).resolve().parent.parent,
+            check=True
+        )
+
+        lines = self.scrape(authorization='Bearer secret').content.decode().splitlines()
+
+        self.assertIn('store_orders_placed_total 5', lines)
+
+
+# ================= INDEXES =================
+
+@skipUnlessDBFeature('supports_partial_indexes')
+class HotQueryIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='shopper', email='shopper@example.com')
+        cls.category = Category.objects.create(name='Books', slug='books')
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan text is only asserted on SQLite')
+        plan = queryset.explain()
+        self.assertIn(f'INDEX {index_name}', plan, plan)
+
+    def test_my_orders(self):
+        self.assertUsesIndex(
+            Order.objects.filter(user=self.user).order_by('-created_at'),
+            'order_user_created_idx'
+        )
+
+    def test_orders_by_status(self):
+        self.assertUsesIndex(Order.objects.filter(status='SHIPPED'), 'order_status_idx')
+
+    def test_orders_by_payment_status(self):
+        self.assertUsesIndex(
+            Order.objects.filter(payment_status='PAID'),
+            'order_payment_status_idx'
+        )
+
+    def test_unread_notifications(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user, is_read=False).order_by('-created_at'),
+            'notification_unread_idx'
+        )
+
+    def test_notification_history(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user).order_by('-created_at'),
+            'notification_user_created_idx'
+        )
+
+    def test_low_stock_products(self):
+        self.assertUsesIndex(Product.objects.filter(stock__lte=5), 'product_low_stock_idx')
+
+    def test_products_by_category(self):
+        self.assertUsesIndex(
+            Product.objects.filter(category=self.category),
+            'store_product_category_id'
+        )
+
+    def test_category_price_range(self):
+        self.assertUsesIndex(
+            Product.objects.filter(category=self.category, price__gte=100, price__lte=500)
+            .order_by('price', 'id'),
+            'product_category_price_idx'
+        )
+
+    def test_login_lookup_by_email(self):
+        self.assertUsesIndex(
+            User.objects.filter(Q(username='shopper@example.com') | Q(email='shopper@example.com')),
+            'store_user_email_idx'
+        )
+
+
+# ================= QUERY BUDGETS & LATENCY BENCHMARKS =================
+#
+# Every view in store/urls.py is driven through the test client against a
+# seeded dataset. A view's query count must stay within its budget, which
+# does not grow with the data, so a change that turns one query into N
+# fails here. Each request runs inside a rolled-back transaction and
+# starts from a cold cache, so every case sees the same state.
+#
+# With STORE_BENCH=1 the views are also timed and their p50/p95 compared
+# with a JSON baseline:
+#
+#   STORE_BENCH_SCALE      fraction of the full dataset (default 0.002;
+#                          1.0 is 100k products, 1M orders)
+#   STORE_BENCH_ROUNDS     timed requests per view (default 30)
+#   STORE_BENCH_TOLERANCE  allowed slowdown over the baseline (default 0.25)
+#   STORE_BENCH_BASELINE   baseline file (default store/benchmarks/baseline.json)
+#   STORE_BENCH_UPDATE=1   rewrite the baseline instead of comparing
+#
+# A missing baseline, or a view missing from it, fails the run until it is
+# recorded with STORE_BENCH_UPDATE=1.
+
+HEAVY_CART_LINES = 200
+
+BENCH_BASELINE = Path(__file__).resolve().parent / 'benchmarks' / 'baseline.json'
+
+# Latency differences below this are noise, whatever the tolerance says.
+BENCH_MIN_REGRESSION_MS = 5.0
+
+
+def bench_settings():
+    return {
+        'enabled': os.environ.get('STORE_BENCH') == '1',
+        'scale': float(os.environ.get('STORE_BENCH_SCALE', '0.002')),
+        'rounds': int(os.environ.get('STORE_BENCH_ROUNDS', '30')),
+        'tolerance': float(os.environ.get('STORE_BENCH_TOLERANCE', '0.25')),
+        'baseline': Path(os.environ.get('STORE_BENCH_BASELINE', BENCH_BASELINE)),
+        'update': os.environ.get('STORE_BENCH_UPDATE') == '1',
+    }
+
+
+def bench_dataset(scale):
+    seed_store(scaled_sizes(scale), images=False)
+
+    shopper = User.objects.get(username=f'{SEED_USERNAME_PREFIX}0')
+    cart_ids = list(
+        Product.objects.filter(stock__gte=5)
+        .order_by('pk')
+        .values_list('pk', flat=True)[:HEAVY_CART_LINES]
+    )
+    order = Order.objects.filter(user=shopper, status='PLACED').order_by('pk').first()
+
+    return {
+        'shopper': shopper,
+        'cart': {str(pk): 1 for pk in cart_ids},
+        'cart_categories': Product.objects.filter(pk__in=cart_ids).values('category').distinct().count(),
+        'product': cart_ids[0],
+        'category': Category.objects.order_by('pk').values_list('slug', flat=True).first(),
+        'order': order.pk,
+        'order_categories': order.items.values('product__category').distinct().count(),
+        'notification': shopper.notifications.values_list('pk', flat=True).first(),
+        'token': EmailVerificationToken.objects.create(user=shopper).token,
+    }
+
+
+ViewCase = namedtuple('ViewCase', 'url_name method kwargs data login budget')
+
+# Budgets are upper bounds on queries per request, session and auth included.
+VIEW_CASES = [
+    ViewCase('login', 'GET', {}, None, False, 0),
+    ViewCase('login', 'POST', {}, {'username': 'nobody', 'password': 'x'}, False, 1),
+    ViewCase('register', 'GET', {}, None, False, 0),
+    ViewCase('register', 'POST', {}, {
+        'username': 'newbie', 'email': 'newbie@example.com', 'password': 'secret123',
+    }, False, 5),
+    ViewCase('verify_email', 'GET', {'token': 'token'}, None, False, 4),
+    ViewCase('logout', 'GET', {}, None, True, 4),
+    ViewCase('home', 'GET', {}, None, True, 5),
+    ViewCase('product_detail', 'GET', {'product_id': 'product'}, None, True, 5),
+    ViewCase('category_products', 'GET', {'slug': 'category'}, None, True, 8),
+    ViewCase('category_products', 'GET', {'slug': 'category'}, {
+        'q': 'item', 'min_price': '100', 'max_price': '5000',
+    }, True, 8),
+    ViewCase('cart', 'GET', {}, None, True, 5),
+    ViewCase('add_to_cart', 'GET', {'product_id': 'product'}, None, True, 5),
+    ViewCase('update_cart', 'GET', {'product_id': 'product', 'action': 'increase'}, None, True, 4),
+    ViewCase('remove_from_cart', 'GET', {'product_id': 'product'}, None, True, 3),
+    ViewCase('checkout', 'GET', {}, None, True, 6),
+    ViewCase('checkout', 'POST', {}, {'address': 'Somewhere', 'payment_method': 'COD'}, True, 13),
+    ViewCase('my_orders', 'GET', {}, None, True, 6),
+    ViewCase('order_detail', 'GET', {'order_id': 'order'}, None, True, 6),
+    ViewCase('cancel_order', 'GET', {'order_id': 'order'}, None, True, 14),
+    ViewCase('invoice', 'GET', {'order_id': 'order'}, None, True, 6),
+    ViewCase('invoice_pdf', 'GET', {'order_id': 'order'}, None, True, 4),
+    ViewCase('profile', 'GET', {}, None, True, 5),
+    ViewCase('change_password', 'GET', {}, None, True, 4),
+    ViewCase('notifications', 'GET', {}, None, True, 6),
+    ViewCase('delete_notification', 'GET', {'notification_id': 'notification'}, None, True, 4),
+    ViewCase('clear_notifications', 'GET', {}, None, True, 3),
+    ViewCase('notification_stream', 'GET', {}, None, True, 2),
+    ViewCase('privacy_policy', 'GET', {}, None, True, 4),
+    ViewCase('terms', 'GET', {}, None, True, 4),
+    ViewCase('shipping_policy', 'GET', {}, None, True, 4),
+    ViewCase('refund_policy', 'GET', {}, None, True, 4),
+    ViewCase('contact', 'GET', {}, None, True, 4),
+    ViewCase('contact', 'GET', {}, None, False, 0),
+    ViewCase('metrics', 'GET', {}, None, False, 1),
+    ViewCase('autocomplete', 'GET', {}, {'q': 'item'}, False, 0),
+    ViewCase('password_reset', 'GET', {}, None, False, 0),
+    ViewCase('password_reset', 'POST', {}, {'email': 'shopper0@example.com'}, False, 2),
+    ViewCase('password_reset_done', 'GET', {}, None, False, 0),
+    ViewCase('password_reset_confirm', 'GET', {'uidb64': 'uid', 'token': 'set-password'}, None, False, 0),
+    ViewCase('password_reset_complete', 'GET', {}, None, False, 0),
+]
+
+# Only writes grow with their input: place_order issues a conditional stock
+# UPDATE per cart line, and the sales rollup touches one row per category
+# in the order (an upsert on checkout, an UPDATE on cancel).
+GROWING_BUDGETS = {
+    ('checkout', 'POST'): {'cart': 1, 'cart_categories': 4},
+    ('cancel_order', 'GET'): {'order_categories': 2},
+}
+
+
+# Views that read or write notifications as part of their job.
+NOTIFICATION_VIEWS = {
+    'notifications', 'delete_notification', 'clear_notifications',
+    'notification_stream', 'cancel_order',
+}
+
+
+# Baseline entries are named after the request, so the filtered search and
+# the anonymous page are timed apart from the plain view.
+def bench_key(case):
+    key = f'{case.method} {case.url_name}'
+    if not case.login:
+        key += ' anonymous'
+    if case.data and case.method == 'GET':
+        key += ' ?' + '&'.join(f'{name}={value}' for name, value in sorted(case.data.items()))
+    return key
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    PERF_SAMPLE_RATE=0,
+    METRICS_TOKEN='scrape'
+)
+class ViewBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bench = bench_settings()
+        cls.data = bench_dataset(cls.bench['scale'])
+
+    def setUp(self):
+        # Built up front, as the WSGI entry point does, so autocomplete
+        # requests are measured against a warm index.
+        autocomplete.warm()
+        snapshots = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshots.cleanup)
+        snapshot_root = override_settings(INVOICE_SNAPSHOT_ROOT=snapshots.name)
+        snapshot_root.enable()
+        self.addCleanup(snapshot_root.disable)
+        # Every request carries the scrape token, as Prometheus would.
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer scrape'
+
+    def url(self, case):
+        kwargs = {
+            name: self.data.get(value, value)
+            for name, value in case.kwargs.items()
+        }
+        return reverse(f'store:{case.url_name}', kwargs=kwargs)
+
+    def budget(self, case):
+        growth = GROWING_BUDGETS.get((case.url_name, case.method), {})
+        return case.budget + sum(
+            per_row * (len(self.data[key]) if isinstance(self.data[key], dict) else self.data[key])
+            for key, per_row in growth.items()
+        )
+
+    def drive(self, case, cold=True):
+        # Everything the request writes (sessions included) is rolled back.
+        with transaction.atomic():
+            self.client.logout()
+            if case.login:
+                self.client.force_login(self.data['shopper'])
+                cart = Cart.objects.create(user=self.data['shopper'])
+                CartItem.objects.bulk_create(
+                    CartItem(cart=cart, product_id=int(pk), quantity=quantity)
+                    for pk, quantity in self.data['cart'].items()
+                )
+            if cold:
+                cache.clear()
+                caches['fragments'].clear()
+
+            url = self.url(case)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                if case.method == 'POST':
+                    response = self.client.post(url, case.data)
+                else:
+                    response = self.client.get(url, case.data)
+                elapsed = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        self.assertLess(response.status_code, 500)
+        return len(queries), elapsed, queries
+
+    def test_every_case_has_its_own_benchmark_key(self):
+        keys = [bench_key(case) for case in VIEW_CASES]
+        self.assertEqual(len(keys), len(set(keys)))
+
+    def test_every_url_has_a_case(self):
+        covered = {case.url_name for case in VIEW_CASES}
+        names = {pattern.name for pattern in store_urls.urlpatterns}
+        self.assertEqual(names - covered, set())
+
+    def test_query_budgets(self):
+        for case in VIEW_CASES:
+            with self.subTest(view=case.url_name, method=case.method):
+                count, _, queries = self.drive(case)
+                self.assertLessEqual(
+                    count,
+                    self.budget(case),
+                    '\n'.join(query['sql'] for query in queries.captured_queries)
+                )
+
+    def test_warm_pages_do_not_query_notifications(self):
+        # Budgets are measured cold; once the navbar summary is cached, a
+        # page that does not touch notifications itself must not query them.
+        table = Notification._meta.db_table
+        for case in VIEW_CASES:
+            if not case.login or case.method != 'GET' or case.url_name in NOTIFICATION_VIEWS:
+                continue
+            with self.subTest(view=case.url_name):
+                self.drive(case)
+                _, _, queries = self.drive(case, cold=False)
+                self.assertEqual(
+                    [query['sql'] for query in queries.captured_queries if table in query['sql']],
+                    []
+                )
+
+    def measure(self, case):
+        # One untimed request warms the caches the view relies on, and
+        # collector pauses are kept out of the timed requests.
+        self.drive(case)
+        gc.collect()
+        gc.disable()
+        try:
+            timings = sorted(
+                self.drive(case, cold=False)[1] * 1000
+                for _ in range(self.bench['rounds'])
+            )
+        finally:
+            gc.enable()
+        return {
+            'p50_ms': round(timings[len(timings) // 2], 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'queries': self.drive(case)[0],
+        }
+
+    def regressions(self, key, current, previous):
+        found = []
+        for metric in ('p50_ms', 'p95_ms'):
+            limit = max(
+                previous[metric] * (1 + self.bench['tolerance']),
+                previous[metric] + BENCH_MIN_REGRESSION_MS
+            )
+            if current[metric] > limit:
+                found.append(
+                    f'{key}: {metric} {current[metric]:.1f}ms > {limit:.1f}ms '
+                    f'(baseline {previous[metric]:.1f}ms)'
+                )
+        return found
+
+    def test_latency_against_baseline(self):
+        if not self.bench['enabled']:
+            self.skipTest('Set STORE_BENCH=1 to run the latency benchmark')
+
+        cases = {bench_key(case): case for case in VIEW_CASES}
+        results = {key: self.measure(case) for key, case in cases.items()}
+
+        path = self.bench['baseline']
+        if self.bench['update']:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({
+                'scale': self.bench['scale'],
+                'views': results,
+            }, indent=2, sort_keys=True) + '\n')
+            return
+        if not path.exists():
+            self.fail(f'No baseline at {path}; record one with STORE_BENCH_UPDATE=1')
+
+        baseline = json.loads(path.read_text())
+        if baseline.get('scale') != self.bench['scale']:
+            self.skipTest(f"Baseline was recorded at scale {baseline.get('scale')}")
+
+        failures = []
+        for key, current in sorted(results.items()):
+            previous = baseline['views'].get(key)
+            if previous is None:
+                failures.append(f'{key}: not in the baseline')
+                continue
+            # A single noisy run is not a regression; it has to repeat.
+            if self.regressions(key, current, previous):
+                failures += self.regressions(key, self.measure(cases[key]), previous)
+        if failures:
+            self.fail('Views off the baseline:\n' + '\n'.join(failures))
@@ -1,19 +1,28 @@
-from django.urls import path
-from . import views
+from django.conf import settings
+from django.urls import path, reverse_lazy
+from . import async_views, views
 from django.contrib.auth import views as auth_views
 
+from .forms import QueuedPasswordResetForm
+
 app_name = 'store'
 
+# The read-heavy views have async twins for ASGI deployments.
+read_views = async_views if settings.STORE_ASYNC_VIEWS else views
+
 urlpatterns = [
 
     # ================= AUTH =================
     path('login/', views.login_view, name='login'),
     path('register/', views.register_view, name='register'),
     path('logout/', views.logout_view, name='logout'),
+    path('verify-email/<uuid:token>/', views.verify_email, name='verify_email'),
 
     # ================= HOME / PRODUCT =================
-    path('', views.home, name='home'),
-    path('product/<int:product_id>/', views.product_detail, name='product_detail'),
+    path('', read_views.home, name='home'),
+    path('product/<int:product_id>/', read_views.product_detail, name='product_detail'),
+    path('category/<slug:slug>/', views.category_products, name='category_products'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
 
     # ================= CART =================
     path('cart/', views.cart_view, name='cart'),
@@ -25,15 +34,17 @@ urlpatterns = [
     path('checkout/', views.checkout, name='checkout'),
 
     # ================= ORDERS =================
-    path('my-orders/', views.my_orders, name='my_orders'),
+    path('my-orders/', read_views.my_orders, name='my_orders'),
     path('order/<int:order_id>/', views.order_detail, name='order_detail'),
     path('cancel-order/<int:order_id>/', views.cancel_order, name='cancel_order'),
     path('invoice/<int:order_id>/', views.invoice, name='invoice'),
+    path('invoice/<int:order_id>/pdf/', views.invoice_pdf, name='invoice_pdf'),
 
     # ================= PROFILE & NOTIFICATIONS =================
     path('profile/', views.user_profile, name='profile'),
     path('change-password/', views.change_password, name='change_password'),
-    path('notifications/', views.notifications_page, name='notifications'),
+    path('notifications/', read_views.notifications_page, name='notifications'),
+    path('notifications/stream/', async_views.notification_stream, name='notification_stream'),
     path('notification/delete/<int:notification_id>/', views.delete_notification, name='delete_notification'),
     path('notification/clear/', views.clear_notifications, name='clear_notifications'),
 
@@ -43,6 +54,9 @@ urlpatterns = [
     path('shipping-policy/', views.shipping_policy, name='shipping_policy'),
     path('refund-policy/', views.refund_policy, name='refund_policy'),
     path('contact/', views.contact_page, name='contact'),
+
+    # ================= MONITORING =================
+    path('metrics', views.metrics, name='metrics'),
 ]
 
 # ================= PASSWORD RESET (DJANGO BUILT-IN) =================
@@ -52,7 +66,10 @@ urlpatterns += [
     path(
         'password-reset/',
         auth_views.PasswordResetView.as_view(
-            template_name='store/password_reset.html'
+            template_name='store/password_reset.html',
+            email_template_name='store/password_reset_email.txt',
+            form_class=QueuedPasswordResetForm,
+            success_url=reverse_lazy('store:password_reset_done')
         ),
         name='password_reset'
     ),
@@ -68,7 +85,8 @@ urlpatterns += [
     path(
         'reset/<uidb64>/<token>/',
         auth_views.PasswordResetConfirmView.as_view(
-            template_name='store/password_reset_confirm.html'
+            template_name='store/password_reset_confirm.html',
+            success_url=reverse_lazy('store:password_reset_complete')
         ),
         name='password_reset_confirm'
     ),
@@ -1,19 +1,45 @@
 import uuid
+from decimal import Decimal
+from urllib.parse import urlencode
 
-from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Q
-from django.core.mail import send_mail
+from django.db.models import Count, Prefetch, Q, Sum
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.urls import reverse
-
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+
+from .autocomplete import complete
+from .cart import (
+    add_item,
+    clear_cart,
+    decrease_item,
+    get_cart,
+    increase_item,
+    load_cart,
+    remove_item,
+)
+from .catalog import category_products_page, get_catalog_page, get_price_histogram
+from .invoices import get_invoice, invoice_etag, orders_with_items
+from .mail import enqueue_mail
+from .metrics import inc, render_metrics
+from .notifications import invalidate_notifications, unread_summary
+from .orders import OutOfStock, place_order, transition_orders
+from .pages import navbar_state, not_modified, page_etag, render_static_page, template_mtime
+from .pagination import paginate_keyset
 from .models import (
+    Category,
     Product,
     Order,
     OrderItem,
+    OutgoingEmail,
     UserProfile,
     Notification,
     EmailVerificationToken
@@ -86,7 +112,7 @@ def register_view(request):
             reverse('store:verify_email', args=[token.token])
         )
 
-        send_mail(
+        enqueue_mail(
             subject='Verify your Smart Shop account',
             message=f"""
 Hello {user.username},
@@ -99,9 +125,7 @@ If you didn’t register, ignore this email.
 
 – Smart Shop Team
             """,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False
+            recipient_list=[user.email]
         )
 
         return render(request, 'store/register_success.html')
@@ -131,86 +155,146 @@ def logout_view(request):
 @login_required
 def home(request):
     return render(request, 'store/home.html', {
-        'products': Product.objects.all()
+        'product_grid': get_catalog_page(request.GET.get('after'))
+    })
+
+
+# ================= CATEGORY =================
+
+def _price_param(value):
+    try:
+        price = Decimal(value)
+    except (TypeError, ArithmeticError):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+@login_required
+def category_products(request, slug):
+    category = get_object_or_404(Category, slug=slug)
+    query = request.GET.get('q', '').strip()
+    min_price = _price_param(request.GET.get('min_price'))
+    max_price = _price_param(request.GET.get('max_price'))
+
+    page = category_products_page(
+        category,
+        cursor=request.GET.get('after'),
+        min_price=min_price,
+        max_price=max_price,
+        query=query
+    )
+
+    filters = {
+        key: value
+        for key, value in (('q', query), ('min_price', min_price), ('max_price', max_price))
+        if value not in ('', None)
+    }
+
+    return render(request, 'store/category_products.html', {
+        'category': category,
+        'products': page,
+        'query': query,
+        'min_price': '' if min_price is None else min_price,
+        'max_price': '' if max_price is None else max_price,
+        'price_buckets': get_price_histogram(category),
+        'filter_query': urlencode(filters),
+        'next_query': urlencode(dict(filters, after=page.next_cursor)) if page.has_next else '',
+        'is_first_page': not request.GET.get('after'),
     })
 
 
+# ================= AUTOCOMPLETE =================
+
+# Public and session-free on purpose: answered from the in-process index
+# without a single query.
+def autocomplete(request):
+    response = JsonResponse({
+        'results': [
+            {
+                'id': pk,
+                'name': name,
+                'url': reverse('store:product_detail', args=[pk]),
+            }
+            for pk, name in complete(request.GET.get('q', '')[:100])
+        ]
+    })
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
 # ================= PRODUCT =================
 
 @login_required
 def product_detail(request, product_id):
     product = get_object_or_404(Product, id=product_id)
-    return render(request, 'store/product_detail.html', {
+    return product_page(request, product)
+
+
+def product_page(request, product):
+    # Stock is not part of updated_at, so its state goes into the ETag;
+    # Last-Modified is informational only and never answers a 304 alone.
+    etag = page_etag(
+        product.pk,
+        product.updated_at.isoformat(),
+        product.stock_status,
+        template_mtime('store/product_detail.html'),
+        navbar_state(request)
+    )
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    response = render(request, 'store/product_detail.html', {
         'product': product
     })
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(product.updated_at.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 # ================= CART =================
+#
+# Carts work before login too; checkout asks for an account and the
+# anonymous cart is merged into it (see cart.merge_anonymous_cart).
 
-@login_required
 def add_to_cart(request, product_id):
     product = get_object_or_404(Product, id=product_id)
 
     if product.stock <= 0:
         return redirect('store:product_detail', product_id=product.id)
 
-    cart = request.session.get('cart', {})
-    pid = str(product_id)
+    cart = get_cart(request)
 
     if request.GET.get('buy_now'):
-        request.session['cart'] = {pid: 1}
+        clear_cart(request)
+        add_item(cart, product)
         return redirect('store:checkout')
 
-    cart[pid] = min(cart.get(pid, 0) + 1, product.stock)
-    request.session['cart'] = cart
+    add_item(cart, product)
     return redirect('store:cart')
 
 
-@login_required
 def update_cart(request, product_id, action):
-    cart = request.session.get('cart', {})
-    pid = str(product_id)
-    product = get_object_or_404(Product, id=product_id)
-
-    if pid in cart:
-        if action == 'increase' and cart[pid] < product.stock:
-            cart[pid] += 1
-        elif action == 'decrease':
-            cart[pid] -= 1
-            if cart[pid] <= 0:
-                del cart[pid]
+    if action == 'increase':
+        increase_item(request, get_object_or_404(Product, id=product_id))
+    elif action == 'decrease':
+        decrease_item(request, product_id)
 
-    request.session['cart'] = cart
     return redirect('store:cart')
 
 
-@login_required
 def remove_from_cart(request, product_id):
-    cart = request.session.get('cart', {})
-    cart.pop(str(product_id), None)
-    request.session['cart'] = cart
+    remove_item(request, product_id)
     return redirect('store:cart')
 
 
-@login_required
 def cart_view(request):
-    cart = request.session.get('cart', {})
-    items = []
-    total = 0
-
-    for pid, qty in cart.items():
-        product = get_object_or_404(Product, id=pid)
-        subtotal = product.price * qty
-        total += subtotal
-        items.append({
-            'product': product,
-            'quantity': qty,
-            'subtotal': subtotal
-        })
+    cart = load_cart(request)
 
     return render(request, 'store/cart.html', {
-        'cart_items': items,
-        'total': total
+        'cart_items': cart.lines,
+        'total': cart.total
     })
 
 
@@ -218,19 +302,12 @@ def cart_view(request):
 
 @login_required
 def checkout(request):
-    cart = request.session.get('cart', {})
+    cart = load_cart(request)
     if not cart:
         return redirect('store:cart')
 
     profile, _ = UserProfile.objects.get_or_create(user=request.user)
-
-    total = 0
-    items = []
-
-    for pid, qty in cart.items():
-        product = get_object_or_404(Product, id=pid)
-        total += product.price * qty
-        items.append((product, qty))
+    total = cart.total
 
     if request.method == 'POST':
         address = request.POST.get('address')
@@ -239,31 +316,17 @@ def checkout(request):
         profile.address = address
         profile.save()
 
-        order = Order.objects.create(
-            user=request.user,
-            address=address,
-            total_amount=total,
-            payment_method=method,
-            payment_status='PAID' if method == 'ONLINE' else 'PENDING',
-            status='PLACED'
-        )
-
-        for product, qty in items:
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=qty,
-                price=product.price
+        try:
+            order = place_order(request.user, cart, address, method)
+        except OutOfStock as exc:
+            inc('store_checkout_failures_total', reason='out_of_stock')
+            messages.error(
+                request,
+                f"Sorry, {exc.product.name} no longer has {exc.requested} in stock"
             )
-            product.stock -= qty
-            product.save()
+            return redirect('store:cart')
 
-        Notification.objects.create(
-            user=request.user,
-            message=f"✅ Order #{order.id} placed successfully"
-        )
-
-        request.session['cart'] = {}
+        clear_cart(request)
         return redirect('store:invoice', order_id=order.id)
 
     return render(request, 'store/checkout.html', {'total': total})
@@ -271,15 +334,42 @@ def checkout(request):
 
 # ================= ORDERS =================
 
+ORDERS_PER_PAGE = 10
+ORDER_PREVIEW_ITEMS = 3
+ORDERS_ORDERING = ('-created_at', '-id')
+
+
+def user_orders(user):
+    return (
+        Order.objects.filter(user=user)
+        .annotate(item_count=Count('items'), unit_count=Sum('items__quantity'))
+        .prefetch_related(Prefetch(
+            'items',
+            queryset=OrderItem.objects.select_related('product').order_by('pk')[:ORDER_PREVIEW_ITEMS],
+            to_attr='preview_items'
+        ))
+    )
+
+
 @login_required
 def my_orders(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'store/my_orders.html', {'orders': orders})
+    page = paginate_keyset(
+        user_orders(request.user),
+        ORDERS_ORDERING,
+        cursor=request.GET.get('after'),
+        per_page=ORDERS_PER_PAGE
+    )
+
+    return render(request, 'store/my_orders.html', {
+        'orders': page,
+        'next_cursor': page.next_cursor,
+        'is_first_page': not request.GET.get('after'),
+    })
 
 
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(orders_with_items(), id=order_id, user=request.user)
     return render(request, 'store/order_detail.html', {'order': order})
 
 
@@ -288,11 +378,10 @@ def cancel_order(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
 
     if order.can_cancel():
-        order.status = 'CANCELLED'
-        order.save()
-        Notification.objects.create(
-            user=request.user,
-            message=f"❌ Order #{order.id} cancelled"
+        transition_orders(
+            Order.objects.filter(pk=order.pk),
+            'CANCELLED',
+            "❌ Order #{id} cancelled"
         )
 
     return redirect('store:my_orders')
@@ -300,8 +389,47 @@ def cancel_order(request, order_id):
 
 @login_required
 def invoice(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
-    return render(request, 'store/invoice.html', {'order': order})
+    order = get_object_or_404(
+        Order.objects.select_related('user'),
+        id=order_id,
+        user=request.user
+    )
+    body = get_invoice(order, 'html')
+
+    # The page around the invoice only varies with the navbar state.
+    etag = invoice_etag(body, request.user.username, unread_summary(request.user)['unread_count'])
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = render(request, 'store/invoice.html', {
+        'order': order,
+        'invoice_body': mark_safe(body.decode())
+    })
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def invoice_pdf(request, order_id):
+    order = get_object_or_404(
+        Order.objects.select_related('user'),
+        id=order_id,
+        user=request.user
+    )
+    content = get_invoice(order, 'pdf')
+
+    etag = invoice_etag(content)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = HttpResponse(content, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="invoice-{order.id}.pdf"'
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 # ================= PROFILE =================
@@ -366,43 +494,87 @@ def change_password(request):
 
 # ================= NOTIFICATIONS =================
 
+NOTIFICATIONS_PER_PAGE = 20
+NOTIFICATIONS_ORDERING = ('-created_at', '-id')
+
+
 @login_required
 def notifications_page(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    notifications.filter(is_read=False).update(is_read=True)
-    return render(request, 'store/notifications.html', {'notifications': notifications})
+    page = paginate_keyset(
+        Notification.objects.filter(user=request.user),
+        NOTIFICATIONS_ORDERING,
+        cursor=request.GET.get('after'),
+        per_page=NOTIFICATIONS_PER_PAGE
+    )
+
+    # Only the rows on screen have been seen. The page keeps is_read as
+    # loaded, so they still show as new this once.
+    unread = [notification.pk for notification in page if not notification.is_read]
+    if unread:
+        Notification.objects.filter(pk__in=unread).update(is_read=True)
+        invalidate_notifications(request.user.pk)
+
+    return render(request, 'store/notifications.html', {
+        'notifications': page,
+        'next_cursor': page.next_cursor,
+        'is_first_page': not request.GET.get('after'),
+    })
 
 
 @login_required
 def delete_notification(request, notification_id):
     notification = get_object_or_404(Notification, id=notification_id, user=request.user)
     notification.delete()
+    invalidate_notifications(request.user.pk)
     return redirect('store:notifications')
 
 
 @login_required
 def clear_notifications(request):
     Notification.objects.filter(user=request.user).delete()
+    invalidate_notifications(request.user.pk)
     return redirect('store:notifications')
 
 
 # ================= STATIC PAGES =================
 
 def privacy_policy(request):
-    return render(request, 'store/privacy_policy.html')
+    return render_static_page(request, 'store/privacy_policy.html')
 
 
 def terms_and_conditions(request):
-    return render(request, 'store/terms.html')
+    return render_static_page(request, 'store/terms.html')
 
 
 def shipping_policy(request):
-    return render(request, 'store/shipping_policy.html')
+    return render_static_page(request, 'store/shipping_policy.html')
 
 
 def refund_policy(request):
-    return render(request, 'store/refund_policy.html')
+    return render_static_page(request, 'store/refund_policy.html')
 
 
 def contact_page(request):
-    return render(request, 'store/contact.html')
+    return render_static_page(request, 'store/contact.html')
+
+
+# ================= MONITORING =================
+
+def metrics(request):
+    # Closed unless the scraper presents METRICS_TOKEN or a staff user is
+    # looking; counters and latencies by URL are not for the public.
+    token = settings.METRICS_TOKEN
+    scraper = bool(token) and constant_time_compare(
+        request.headers.get('Authorization', ''),
+        f'Bearer {token}'
+    )
+    if not scraper and not request.user.is_staff:
+        return HttpResponseForbidden()
+
+    gauges = {
+        'store_email_queue_depth': OutgoingEmail.objects.filter(status='PENDING').count(),
+    }
+    return HttpResponse(
+        render_metrics(gauges),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )